@@ -193,6 +193,7 @@ async function main(argv) {
     .option("--offset <n>", "Offset", "0")
     .option("--unread-only")
     .option("--folder <name>", "Folder", "all")
+    .option("--cached", "Search subject/sender in the local sync cache (falls back to IMAP)")
     .action(async (opts) => {
       const result = await email.searchEmails({
         query: opts.query,
@@ -203,6 +204,7 @@ async function main(argv) {
         offset: Number(opts.offset),
         unread_only: Boolean(opts.unreadOnly),
         folder: opts.folder,
+        use_cache: Boolean(opts.cached),
       });
       const rc = contract.handleJsonOrText({ result, asJson, pretty, printText: () => _printTextNotImplemented("email search") });
       process.exit(rc);
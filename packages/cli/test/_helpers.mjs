@@ -1,4 +1,5 @@
 import fs from "node:fs";
+import { createRequire } from "node:module";
 import path from "node:path";
 
 export function readSchema(name) {
@@ -7,6 +8,21 @@ export function readSchema(name) {
   return JSON.parse(fs.readFileSync(p, "utf8"));
 }
 
+// Rows (value arrays) of one query against the sync cache db under dataDir,
+// read with core's own sql.js.
+export async function queryCacheDb(dataDir, sql) {
+  const repoRoot = path.resolve(import.meta.dirname, "..", "..", "..");
+  const coreRequire = createRequire(path.join(repoRoot, "packages", "core", "package.json"));
+  const SQL = await coreRequire("sql.js/dist/sql-asm.js")();
+  const db = new SQL.Database(fs.readFileSync(path.join(dataDir, "email_sync.db")));
+  try {
+    const [res] = db.exec(sql);
+    return res ? res.values : [];
+  } finally {
+    db.close();
+  }
+}
+
 export function ensureDir(p) {
   fs.mkdirSync(p, { recursive: true });
 }
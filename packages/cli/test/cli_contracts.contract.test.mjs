@@ -4,7 +4,7 @@ import path from "node:path";
 import fs from "node:fs";
 import Ajv from "ajv";
 
-import { defaultAuth, readSchema, testEnv, writeAuthJson } from "./_helpers.mjs";
+import { defaultAuth, queryCacheDb, readSchema, testEnv, writeAuthJson } from "./_helpers.mjs";
 
 const ajv = new Ajv({ allErrors: true, allowUnionTypes: true });
 
@@ -46,6 +46,8 @@ describe("CLI JSON contract - MVP commands", () => {
     expect(payload.accounts.length).toBeGreaterThan(0);
     expect(payload.accounts[0]).toHaveProperty("imap");
     expect(payload.accounts[0]).toHaveProperty("smtp");
+    // Counts come from one STATUS on INBOX.
+    expect(payload.accounts[0].imap).toMatchObject({ success: true, total_emails: 3, unread_emails: 1 });
   });
 
   it("account test-connection fails for unknown --account-id", async () => {
@@ -99,6 +101,37 @@ describe("CLI JSON contract - MVP commands", () => {
     expectValid("email_list.schema.json", payload);
   });
 
+  it("email list --live pages by the top sequence range", async () => {
+    const root = tmpRoot("email_list_live_range");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    // The newest page is the highest sequence numbers (UIDs 102, 103), not
+    // the newest dates; rows then come back date-sorted.
+    const one = await execa(
+      "node",
+      [mailboxBin(), "email", "list", "--live", "--account-id", "mock_acc", "--limit", "2", "--json"],
+      { reject: false, env }
+    );
+    expect(one.exitCode).toBe(0);
+    const onePayload = JSON.parse(one.stdout);
+    expect(onePayload).toHaveProperty("total_in_folder", 3);
+    expect(onePayload.emails.map((e) => e.uid)).toEqual(["102", "103"]);
+
+    // Merged (all-accounts) listing fetches limit + offset per account.
+    const merged = await execa(
+      "node",
+      [mailboxBin(), "email", "list", "--live", "--limit", "1", "--offset", "1", "--json"],
+      { reject: false, env }
+    );
+    expect(merged.exitCode).toBe(0);
+    const mergedPayload = JSON.parse(merged.stdout);
+    expect(mergedPayload.emails.map((e) => e.uid)).toEqual(["103"]);
+    expect(mergedPayload.accounts_info[0]).toHaveProperty("fetched_raw", 2);
+  });
+
   it("email show outputs body + attachments metadata", async () => {
     const root = tmpRoot("email_show");
     fs.rmSync(root, { recursive: true, force: true });
@@ -218,6 +251,54 @@ describe("CLI JSON contract - MVP commands", () => {
     expect(payload).toHaveProperty("would_delete", 1);
   });
 
+  it("email mark reports per-id results when the batch is rejected", async () => {
+    const root = tmpRoot("email_mark_partial");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    // 999 doesn't exist: the mock rejects the whole UID set (returns false),
+    // then the per-UID retry marks 102 and fails 999 alone.
+    const r = await execa(
+      "node",
+      [mailboxBin(), "email", "mark", "102", "999", "--read", "--folder", "INBOX", "--account-id", "mock_acc", "--confirm", "--json"],
+      { reject: false, env }
+    );
+
+    expect(r.exitCode).toBe(1);
+    const payload = JSON.parse(r.stdout);
+    expect(payload).toHaveProperty("success", false);
+    expect(payload).toHaveProperty("marked_count", 1);
+    expect(payload.results.map((x) => [x.email_id, x.success])).toEqual([
+      ["102", true],
+      ["999", false],
+    ]);
+  });
+
+  it("email delete reports per-id results when the batch is rejected", async () => {
+    const root = tmpRoot("email_delete_partial");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    const r = await execa(
+      "node",
+      [mailboxBin(), "email", "delete", "101", "999", "--folder", "INBOX", "--account-id", "mock_acc", "--confirm", "--json"],
+      { reject: false, env }
+    );
+
+    expect(r.exitCode).toBe(1);
+    const payload = JSON.parse(r.stdout);
+    expect(payload).toHaveProperty("success", false);
+    expect(payload).toHaveProperty("deleted_count", 1);
+    expect(payload.results.map((x) => [x.email_id, x.success])).toEqual([
+      ["101", true],
+      ["999", false],
+    ]);
+  });
+
   it("sync status returns scheduler fields", async () => {
     const root = tmpRoot("sync_status");
     fs.rmSync(root, { recursive: true, force: true });
@@ -258,6 +339,182 @@ describe("CLI JSON contract - MVP commands", () => {
     expect(listPayload).toHaveProperty("from_cache");
   });
 
+  it("sync force stores To/Cc addresses in email_recipients", async () => {
+    const root = tmpRoot("sync_force_recipients");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    const force = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "mock_acc", "--json"], { reject: false, env });
+    expect(force.exitCode).toBe(0);
+
+    const rows = await queryCacheDb(
+      env.MAILBOX_DATA_DIR,
+      `SELECT r.kind, r.idx, r.address FROM email_recipients r
+       JOIN emails e ON e.id = r.email_id WHERE e.uid = '103' ORDER BY r.kind, r.idx`
+    );
+    expect(rows).toEqual([
+      ["cc", 0, "lead@example.com"],
+      ["to", 0, "mock@example.com"],
+    ]);
+
+    const [[recipients]] = await queryCacheDb(env.MAILBOX_DATA_DIR, "SELECT recipients FROM emails WHERE uid = '103'");
+    expect(JSON.parse(recipients)).toEqual({ to: "mock@example.com", cc: "lead@example.com" });
+  });
+
+  it("sync force --full compacts inside the sync write", async () => {
+    const root = tmpRoot("sync_force_full");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    for (let i = 0; i < 2; i += 1) {
+      const r = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "mock_acc", "--full", "--json"], { reject: false, env });
+      expect(r.exitCode).toBe(0);
+      expect(JSON.parse(r.stdout)).toHaveProperty("success", true);
+    }
+
+    expect(await queryCacheDb(env.MAILBOX_DATA_DIR, "PRAGMA auto_vacuum")).toEqual([[2]]);
+    expect(await queryCacheDb(env.MAILBOX_DATA_DIR, "PRAGMA freelist_count")).toEqual([[0]]);
+    expect(await queryCacheDb(env.MAILBOX_DATA_DIR, "SELECT sync_type, status FROM sync_history ORDER BY id")).toEqual([
+      ["full", "success"],
+      ["full", "success"],
+    ]);
+  });
+
+  it("sync force with nothing to write leaves the cache file alone", async () => {
+    const root = tmpRoot("sync_force_noop");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    const first = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "mock_acc", "--json"], { reject: false, env });
+    expect(first.exitCode).toBe(0);
+    const dbFile = path.join(env.MAILBOX_DATA_DIR, "email_sync.db");
+    const before = fs.statSync(dbFile).mtimeMs;
+
+    const r = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "does-not-exist", "--json"], { reject: false, env });
+    expect(r.exitCode).toBe(1);
+    expect(fs.statSync(dbFile).mtimeMs).toBe(before);
+  });
+
+  it("email search --cached matches synced headers from the cache db", async () => {
+    const root = tmpRoot("email_search_cached");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    const force = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "mock_acc", "--json"], { reject: false, env });
+    expect(force.exitCode).toBe(0);
+
+    const r = await execa(
+      "node",
+      [mailboxBin(), "email", "search", "--query", "Hello", "--account-id", "mock_acc", "--cached", "--json"],
+      { reject: false, env }
+    );
+    expect(r.exitCode).toBe(0);
+    const payload = JSON.parse(r.stdout);
+    expect(payload).toHaveProperty("success", true);
+    expect(payload).toHaveProperty("from_cache", true);
+    expect(payload).toHaveProperty("total_found", 1);
+    expect(payload.emails.map((e) => e.uid)).toEqual(["101"]);
+  });
+
+  it("email search --cached matches CJK substrings via the LIKE fallback", async () => {
+    const root = tmpRoot("email_search_cached_cjk");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    const force = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "mock_acc", "--json"], { reject: false, env });
+    expect(force.exitCode).toBe(0);
+
+    const r = await execa(
+      "node",
+      [mailboxBin(), "email", "search", "--query", "周报", "--account-id", "mock_acc", "--cached", "--json"],
+      { reject: false, env }
+    );
+    expect(r.exitCode).toBe(0);
+    const payload = JSON.parse(r.stdout);
+    expect(payload).toHaveProperty("success", true);
+    expect(payload).toHaveProperty("from_cache", true);
+    expect(payload).toHaveProperty("total_found", 1);
+    expect(payload.emails.map((e) => e.uid)).toEqual(["103"]);
+  });
+
+  it("email search --cached confirms a cache miss on the server", async () => {
+    const root = tmpRoot("email_search_cached_miss");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    const force = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "mock_acc", "--json"], { reject: false, env });
+    expect(force.exitCode).toBe(0);
+
+    const r = await execa(
+      "node",
+      [mailboxBin(), "email", "search", "--query", "no-such-subject", "--account-id", "mock_acc", "--cached", "--json"],
+      { reject: false, env }
+    );
+    expect(r.exitCode).toBe(0);
+    const payload = JSON.parse(r.stdout);
+    expect(payload).toHaveProperty("success", true);
+    expect(payload).not.toHaveProperty("from_cache");
+    expect(payload).toHaveProperty("total_found", 0);
+    expect(payload.failed_searches).toEqual([]);
+  });
+
+  it("email search --cached reports an unreadable cache and falls back to IMAP", async () => {
+    const root = tmpRoot("email_search_cached_broken");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+    fs.mkdirSync(env.MAILBOX_DATA_DIR, { recursive: true });
+    fs.writeFileSync(path.join(env.MAILBOX_DATA_DIR, "email_sync.db"), "not a sqlite file");
+
+    const r = await execa(
+      "node",
+      [mailboxBin(), "email", "search", "--query", "Hello", "--account-id", "mock_acc", "--cached", "--json"],
+      { reject: false, env }
+    );
+    expect(r.exitCode).toBe(0);
+    const payload = JSON.parse(r.stdout);
+    expect(payload).toHaveProperty("success", true);
+    expect(payload).not.toHaveProperty("from_cache");
+    expect(payload.emails.map((e) => e.uid)).toEqual(["101"]);
+    expect(payload.failed_searches).toHaveLength(1);
+    expect(payload.failed_searches[0]).toMatchObject({ source: "cache" });
+    expect(payload.failed_searches[0].error).toEqual(expect.any(String));
+  });
+
+  it("email search --cached fails for unknown --account-id", async () => {
+    const root = tmpRoot("email_search_cached_invalid");
+    fs.rmSync(root, { recursive: true, force: true });
+
+    const env = testEnv(root);
+    writeAuthJson(env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+    const force = await execa("node", [mailboxBin(), "sync", "force", "--account-id", "mock_acc", "--json"], { reject: false, env });
+    expect(force.exitCode).toBe(0);
+
+    const r = await execa(
+      "node",
+      [mailboxBin(), "email", "search", "--query", "Hello", "--account-id", "does-not-exist", "--cached", "--json"],
+      { reject: false, env }
+    );
+    expect(r.exitCode).toBe(1);
+    const payload = JSON.parse(r.stdout);
+    expect(payload).toHaveProperty("success", false);
+    expect(payload).toHaveProperty("error");
+  });
+
   it("digest run returns expected top-level fields", async () => {
     const root = tmpRoot("digest_run");
     fs.rmSync(root, { recursive: true, force: true });
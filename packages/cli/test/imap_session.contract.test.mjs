@@ -0,0 +1,143 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest";
+import { createRequire } from "node:module";
+import path from "node:path";
+import fs from "node:fs";
+
+import { defaultAuth, testEnv, writeAuthJson } from "./_helpers.mjs";
+
+// In-process: these paths only show up when several operations share one
+// pooled (mock) IMAP client, which a single CLI invocation rarely does.
+const root = path.join(import.meta.dirname, ".tmp", "imap_session");
+fs.rmSync(root, { recursive: true, force: true });
+Object.assign(process.env, testEnv(root));
+writeAuthJson(process.env.MAILBOX_CONFIG_DIR, defaultAuth());
+
+const require = createRequire(import.meta.url);
+const coreSrc = path.join(import.meta.dirname, "..", "..", "core", "src");
+const accounts = require(path.join(coreSrc, "services", "accounts.js"));
+const imap = require(path.join(coreSrc, "services", "imap.js"));
+const email = require(path.join(coreSrc, "services", "email.js"));
+const { getMailbox, getMockAccount, resetMockState } = require(path.join(coreSrc, "testing", "mock_store.js"));
+
+function mockAccount() {
+  return accounts.getAccountByIdOrEmail("mock_acc").account;
+}
+
+describe("IMAP client pool (mock)", () => {
+  beforeEach(() => {
+    resetMockState();
+  });
+
+  afterEach(async () => {
+    await imap.closeImapClients();
+  });
+
+  it("hands the same client to back-to-back operations on an account", async () => {
+    const acc = mockAccount();
+    const first = await imap.withImapClient(acc, async (client) => client);
+    const second = await imap.withImapClient(acc, async (client) => client);
+    expect(second).toBe(first);
+  });
+
+  it("opens a one-off client while the pooled one is busy", async () => {
+    const acc = mockAccount();
+    const [outer, inner] = await imap.withImapClient(acc, async (client) => [
+      client,
+      await imap.withImapClient(acc, async (other) => other),
+    ]);
+    expect(inner).not.toBe(outer);
+    expect(await imap.withImapClient(acc, async (client) => client)).toBe(outer);
+  });
+
+  it("test-connection reads counts via STATUS when the folder isn't selected", async () => {
+    const acc = mockAccount();
+    const client = await imap.withImapClient(acc, async (c) => c);
+    const status = vi.spyOn(client, "status");
+    expect(await imap.testConnection(acc, "INBOX")).toEqual({ success: true, total_emails: 3, unread_emails: 1 });
+    expect(status).toHaveBeenCalledTimes(1);
+  });
+
+  it("test-connection skips STATUS on the already-selected folder", async () => {
+    const acc = mockAccount();
+    const client = await imap.withImapClient(acc, async (c) => {
+      await c.mailboxOpen("INBOX");
+      return c;
+    });
+    const status = vi.spyOn(client, "status");
+    const noop = vi.spyOn(client, "noop");
+    expect(await imap.testConnection(acc, "INBOX")).toEqual({ success: true, total_emails: 3, unread_emails: 1 });
+    expect(status).not.toHaveBeenCalled();
+    expect(noop).toHaveBeenCalledTimes(1);
+  });
+
+  it("test-connection recounts unseen on the already-selected folder", async () => {
+    const acc = mockAccount();
+    await imap.withImapClient(acc, async (c) => c.mailboxOpen("INBOX"));
+    // Read elsewhere after the SELECT; the client's cached unseen is now stale.
+    getMailbox("mock_acc", "INBOX").messages.find((m) => m.uid === 102).flags.add("\\Seen");
+    expect(await imap.testConnection(acc, "INBOX")).toEqual({ success: true, total_emails: 3, unread_emails: 0 });
+  });
+
+  it("unread-only list takes unread_count from the UNSEEN search", async () => {
+    const acc = mockAccount();
+    const client = await imap.withImapClient(acc, async (c) => c);
+    // Servers may omit UNSEEN from the SELECT response.
+    const open = client.mailboxOpen.bind(client);
+    vi.spyOn(client, "mailboxOpen").mockImplementation(async (name) => {
+      const mb = await open(name);
+      delete mb.unseen;
+      return mb;
+    });
+    const search = vi.spyOn(client, "search");
+    const res = await email.listEmails({ account_id: "mock_acc", folder: "INBOX", unread_only: true, use_cache: false });
+    expect(res.success).toBe(true);
+    expect(res.emails.map((e) => e.uid)).toEqual(["102"]);
+    expect(res.unread_count).toBe(1);
+    expect(search).toHaveBeenCalledTimes(1);
+    expect(search.mock.calls[0][0]).toEqual({ seen: false });
+  });
+
+  it("re-lists a still-selected folder with a NOOP instead of a re-SELECT", async () => {
+    const acc = mockAccount();
+    const first = await email.listEmails({ account_id: "mock_acc", folder: "INBOX", limit: 10, use_cache: false });
+    expect(first.total_in_folder).toBe(3);
+
+    getMailbox("mock_acc", "INBOX").messages.push({
+      uid: 104,
+      messageId: "<m104@example.com>",
+      subject: "Arrived later",
+      from: "late@example.com",
+      to: "mock@example.com",
+      cc: "",
+      date: "2026-02-02 00:00:00",
+      flags: new Set([]),
+      body: "late",
+      html: "",
+      attachments: [],
+    });
+    const client = await imap.withImapClient(acc, async (c) => c);
+    const open = vi.spyOn(client, "mailboxOpen");
+    const noop = vi.spyOn(client, "noop");
+    const search = vi.spyOn(client, "search");
+    const second = await email.listEmails({ account_id: "mock_acc", folder: "INBOX", limit: 10, use_cache: false });
+    expect(open).not.toHaveBeenCalled();
+    expect(noop).toHaveBeenCalledTimes(1);
+    expect(second.total_in_folder).toBe(4);
+    // NOOP leaves the SELECT-time unseen (1) in place; the count is redone.
+    expect(search).toHaveBeenCalledWith({ seen: false }, { uid: true });
+    expect(second.unread_count).toBe(2);
+    expect(second.emails.map((e) => e.uid)).toContain("104");
+  });
+
+  it("doesn't remember a guessed trash folder", async () => {
+    const boxes = getMockAccount("mock_acc").mailboxes;
+    delete boxes.Trash;
+    const miss = await email.deleteEmails({ email_ids: ["101"], account_id: "mock_acc", trash_folder: "Bin" });
+    expect(miss.success).toBe(false);
+
+    boxes["Deleted Items"] = { messages: [] };
+    const hit = await email.deleteEmails({ email_ids: ["101"], account_id: "mock_acc", trash_folder: "Bin" });
+    expect(hit.success).toBe(true);
+    expect(boxes["Deleted Items"].messages.map((m) => m.uid)).toEqual([101]);
+  });
+});
@@ -4,9 +4,9 @@ const path = require("path");
 const { paths } = require("@mailbox/shared");
 
 const accounts = require("./accounts");
-const { withImapClient } = require("./imap");
+const { IMAP_CONCURRENCY, mapWithConcurrency, withImapClient } = require("./imap");
 const { sendMail } = require("./smtp");
-const { formatDateTime, firstAddress, hasAttachmentsFromBodyStructure, formatSize } = require("./format");
+const { formatDateTime, firstAddress, formatAddressList, hasAttachmentsFromBodyStructure, formatSize } = require("./format");
 
 function _isTestMode() {
   return String(process.env.MAILBOX_TEST_MODE || "").trim() === "1";
@@ -19,6 +19,19 @@ function _normalizeFolder(folder) {
   return f;
 }
 
+// A pooled client may still have this folder selected from its previous
+// use; a NOOP picks up EXISTS/EXPUNGE changes without paying for a re-SELECT.
+// ImapFlow does not refresh unseen on NOOP, so the SELECT-time count is
+// dropped and callers that need it recount.
+async function _openMailbox(client, folder) {
+  const cur = client.mailbox;
+  if (cur && cur.path === folder && !cur.readOnly) {
+    await client.noop();
+    return { ...cur, unseen: undefined };
+  }
+  return client.mailboxOpen(folder);
+}
+
 function _uidsSortedDesc(uids) {
   return [...uids].map((n) => Number(n)).filter((n) => Number.isFinite(n)).sort((a, b) => b - a);
 }
@@ -52,26 +65,45 @@ function _parseDateInput(raw, { end = false } = {}) {
 async function _fetchEmailsForAccount({ account, folder, limit, offset, unreadOnly, since, before }) {
   const openFolder = _normalizeFolder(folder);
   return withImapClient(account, async (client) => {
-    const st = await client.mailboxOpen(openFolder);
-    // ImapFlow defaults to sequence numbers; force UID mode.
-    const criteria = unreadOnly ? { seen: false } : { all: true };
-    if (since) criteria.since = since;
-    if (before) criteria.before = before;
-    const uids = await client.search(criteria, { uid: true });
-    const sorted = _uidsSortedDesc(uids);
-    const slice = sorted.slice(offset, offset + limit);
-
+    const st = await _openMailbox(client, openFolder);
+    let unreadCount = typeof st.unseen === "number" ? st.unseen : null;
+    let range;
+    let rangeOpts;
+    if (!unreadOnly && !since && !before) {
+      // Unfiltered page: UIDs ascend with sequence numbers, so the newest
+      // `limit` after `offset` are the top sequence range. No SEARCH ALL
+      // (and no full UID list over the wire) needed.
+      const hi = Number(st.exists || 0) - offset;
+      range = hi >= 1 && limit > 0 ? `${Math.max(1, hi - limit + 1)}:${hi}` : null;
+      rangeOpts = {};
+    } else {
+      // ImapFlow defaults to sequence numbers; force UID mode.
+      const criteria = unreadOnly ? { seen: false } : { all: true };
+      if (since) criteria.since = since;
+      if (before) criteria.before = before;
+      const uids = await client.search(criteria, { uid: true });
+      const sorted = _uidsSortedDesc(uids);
+      // An undated UNSEEN search already is the unread count.
+      if (unreadOnly && !since && !before) unreadCount = sorted.length;
+      range = sorted.slice(offset, offset + limit);
+      rangeOpts = { uid: true };
+    }
+    if (unreadCount === null) unreadCount = (await client.search({ seen: false }, { uid: true })).length;
+
+    const fetched = range
+      ? client.fetch(
+          range,
+          {
+            envelope: true,
+            flags: true,
+            internalDate: true,
+            bodyStructure: true,
+          },
+          rangeOpts
+        )
+      : [];
     const emails = [];
-    for await (const msg of client.fetch(
-      slice,
-      {
-        envelope: true,
-        flags: true,
-        internalDate: true,
-        bodyStructure: true,
-      },
-      { uid: true }
-    )) {
+    for await (const msg of fetched) {
       const env = msg.envelope || {};
       const flags = msg.flags || new Set([]);
       const unread = !flags.has("\\Seen");
@@ -81,6 +113,8 @@ async function _fetchEmailsForAccount({ account, folder, limit, offset, unreadOn
         message_id: env.messageId || "",
         subject: env.subject || "",
         from: firstAddress(env.from),
+        to: formatAddressList(env.to),
+        cc: formatAddressList(env.cc),
         date: formatDateTime(msg.internalDate || env.date),
         unread,
         has_attachments: hasAttachmentsFromBodyStructure(msg.bodyStructure),
@@ -95,7 +129,7 @@ async function _fetchEmailsForAccount({ account, folder, limit, offset, unreadOn
       success: true,
       emails,
       total_in_folder: Number(st.exists || 0),
-      unread_count: Number(st.unseen || 0),
+      unread_count: unreadCount,
       fetched: emails.length,
       folder: openFolder,
     };
@@ -185,9 +219,10 @@ async function listEmails({
       };
     }
 
-    for (const acc of list) {
+    // Accounts are independent servers: fetch them concurrently (bounded),
+    // keeping results in account order.
+    const fetched = await mapWithConcurrency(list, IMAP_CONCURRENCY, async (acc) => {
       try {
-        // eslint-disable-next-line no-await-in-loop
         const r = await _fetchEmailsForAccount({
           account: acc,
           folder,
@@ -197,11 +232,12 @@ async function listEmails({
           since,
           before,
         });
-        results.push({ account: acc, ...r });
+        return { account: acc, ...r };
       } catch (e) {
-        results.push({ account: acc, success: false, error: e && e.message ? e.message : "fetch failed" });
+        return { account: acc, success: false, error: e && e.message ? e.message : "fetch failed" };
       }
-    }
+    });
+    results.push(...fetched);
   }
 
   const ok = results.filter((r) => r.success);
@@ -252,7 +288,17 @@ async function listEmails({
   };
 }
 
-async function searchEmails({ query, account_id = "", date_from = "", date_to = "", limit = 50, offset = 0, unread_only = false, folder = "all" } = {}) {
+async function searchEmails({
+  query,
+  account_id = "",
+  date_from = "",
+  date_to = "",
+  limit = 50,
+  offset = 0,
+  unread_only = false,
+  folder = "all",
+  use_cache = false,
+} = {}) {
   const q = String(query || "");
   if (!q.trim()) return { success: false, error: "Missing --query" };
 
@@ -263,6 +309,54 @@ async function searchEmails({ query, account_id = "", date_from = "", date_to =
   const started = Date.now();
   const openFolder = _normalizeFolder(folder);
 
+  // Header-only search over email_sync.db (subject/sender). Falls back to IMAP
+  // when there is no cache file yet, when the cache read fails (reported in
+  // failed_searches), or when it has no match: a hit may have arrived since
+  // the last sync, and an empty result is cheap to confirm on the server.
+  const failedSearches = [];
+  if (use_cache) {
+    const pc = paths.getPathConfig();
+    const resolved = account_id ? accounts.getAccountByIdOrEmail(account_id) : null;
+    if (resolved && !resolved.success) return resolved;
+    const resolvedId = resolved ? resolved.account.id : "";
+    // Same scope as the IMAP path below: "all"/empty means INBOX there too.
+    const cache = await require("../storage/sync_db").searchEmailsFromCache({
+      dbPath: pc.emailSyncDb,
+      query: q,
+      accountId: resolvedId,
+      folder: openFolder,
+      unreadOnly,
+      limit: lim,
+      offset: off,
+      dateFrom: _parseDateInput(date_from).sql,
+      dateTo: _parseDateInput(date_to, { end: true }).sql,
+    });
+    if (cache && !cache.success) {
+      failedSearches.push({ source: "cache", error: cache.error });
+    } else if (cache && cache.total_found > 0) {
+      const all = accounts.getAllAccountsResolved();
+      const accounts_count = resolvedId ? 1 : (all.success ? (all.accounts || []).length : 0);
+      return {
+        success: true,
+        emails: cache.emails,
+        total_found: cache.total_found,
+        displayed: cache.emails.length,
+        accounts_count,
+        offset: off,
+        limit: lim,
+        total_emails: cache.emails.length,
+        accounts_searched: accounts_count,
+        accounts_info: [],
+        search_time: (Date.now() - started) / 1000,
+        search_params: { query: q, date_from, date_to, unread_only: unreadOnly, folder },
+        failed_accounts: [],
+        failed_searches: [],
+        partial_success: false,
+        from_cache: true,
+      };
+    }
+  }
+
   const df = date_from ? new Date(String(date_from)) : null;
   const dt = date_to ? new Date(String(date_to)) : null;
   const since = df && !Number.isNaN(df.getTime()) ? df : null;
@@ -277,9 +371,6 @@ async function searchEmails({ query, account_id = "", date_from = "", date_to =
   if (since) baseCriteria.since = since;
   if (before) baseCriteria.before = before;
 
-  const failed_accounts = [];
-  const perAccount = [];
-
   const targets = [];
   if (account_id) {
     const acc = accounts.getAccountByIdOrEmail(account_id);
@@ -294,9 +385,10 @@ async function searchEmails({ query, account_id = "", date_from = "", date_to =
   // Fetch more than needed per account so we can merge and slice globally.
   const perAccountFetchLimit = Math.max(lim + off, 200);
 
-  for (const acc of targets) {
+  // One server-side search per account, run concurrently (bounded); results
+  // stay in account order.
+  const perAccount = await mapWithConcurrency(targets, IMAP_CONCURRENCY, async (acc) => {
     try {
-      // eslint-disable-next-line no-await-in-loop
       const r = await withImapClient(acc, async (client) => {
         const lock = await client.getMailboxLock(openFolder);
         try {
@@ -338,12 +430,14 @@ async function searchEmails({ query, account_id = "", date_from = "", date_to =
           lock.release();
         }
       });
-      perAccount.push({ account: acc, ...r });
+      return { account: acc, ...r };
     } catch (e) {
-      failed_accounts.push({ account: acc.email || "", account_id: acc.id || "", error: e && e.message ? e.message : "search failed" });
-      perAccount.push({ account: acc, success: false, error: e && e.message ? e.message : "search failed", total_found: 0, emails: [] });
+      return { account: acc, success: false, error: e && e.message ? e.message : "search failed", total_found: 0, emails: [] };
     }
-  }
+  });
+  const failed_accounts = perAccount
+    .filter((r) => !r.success)
+    .map((r) => ({ account: r.account.email || "", account_id: r.account.id || "", error: r.error }));
 
   const allEmails = perAccount.flatMap((r) => (r && r.success ? r.emails || [] : []));
   allEmails.sort((a, b) => String(b.date || "").localeCompare(String(a.date || "")));
@@ -367,7 +461,7 @@ async function searchEmails({ query, account_id = "", date_from = "", date_to =
     search_time,
     search_params: { query: q, date_from, date_to, unread_only: unreadOnly, folder },
     failed_accounts,
-    failed_searches: [],
+    failed_searches: failedSearches,
     partial_success: failed_accounts.length > 0,
   };
 }
@@ -393,14 +487,13 @@ async function showEmail({
 
   const openFolder = _normalizeFolder(folder);
   return withImapClient(acc.account, async (client) => {
-    await client.mailboxOpen(openFolder);
+    await _openMailbox(client, openFolder);
     const msg = await client.fetchOne(
       Number(id),
       {
         envelope: true,
         flags: true,
         internalDate: true,
-        bodyStructure: true,
         source: true,
       },
       { uid: true }
@@ -467,7 +560,8 @@ async function showEmail({
     }
 
     const { simpleParser } = require("mailparser");
-    const parsed = await simpleParser(msg.source);
+    // textAsHtml is never returned, so don't build or linkify it.
+    const parsed = await simpleParser(msg.source, { skipTextToHtml: true, skipTextLinks: true });
     const flags = msg.flags || new Set([]);
     const unread = !flags.has("\\Seen");
 
@@ -527,6 +621,29 @@ async function showEmail({
   });
 }
 
+// Run one IMAP command (STORE/MOVE/EXPUNGE) over the whole UID set: one
+// round trip instead of one per message. If the server rejects the set,
+// retry UID by UID so each id still gets its own result. ImapFlow reports a
+// rejected command by returning false as well as by throwing. Returns an
+// error message (or null) per uid.
+async function _applyToUids(uids, op) {
+  try {
+    if ((await op(uids)) !== false) return uids.map(() => null);
+  } catch {
+    // fall through to per-UID attempts
+  }
+  const errors = [];
+  for (const uid of uids) {
+    try {
+      // eslint-disable-next-line no-await-in-loop
+      errors.push((await op(uid)) === false ? "failed" : null);
+    } catch (e) {
+      errors.push(e && e.message ? e.message : "failed");
+    }
+  }
+  return errors;
+}
+
 async function markEmails({ email_ids, mark_as, folder = "INBOX", account_id = "", dry_run = false } = {}) {
   const ids = (email_ids || []).map((x) => String(x));
   if (!ids.length) return { success: false, error: "Missing email_ids" };
@@ -549,19 +666,16 @@ async function markEmails({ email_ids, mark_as, folder = "INBOX", account_id = "
   const openFolder = _normalizeFolder(folder);
 
   return withImapClient(acc.account, async (client) => {
-    await client.mailboxOpen(openFolder);
+    await _openMailbox(client, openFolder);
     const uids = ids.map((x) => Number(x));
-    const results = [];
-    for (const uid of uids) {
-      try {
-        // eslint-disable-next-line no-await-in-loop
-        if (markAs === "read") await client.messageFlagsAdd(uid, ["\\Seen"], { uid: true });
-        else await client.messageFlagsRemove(uid, ["\\Seen"], { uid: true });
-        results.push({ success: true, email_id: String(uid), folder: openFolder, account_id: acc.account.id });
-      } catch (e) {
-        results.push({ success: false, email_id: String(uid), folder: openFolder, account_id: acc.account.id, error: e && e.message ? e.message : "failed" });
-      }
-    }
+    const errors = await _applyToUids(uids, (range) =>
+      markAs === "read" ? client.messageFlagsAdd(range, ["\\Seen"], { uid: true }) : client.messageFlagsRemove(range, ["\\Seen"], { uid: true })
+    );
+    const results = uids.map((uid, i) =>
+      errors[i] === null
+        ? { success: true, email_id: String(uid), folder: openFolder, account_id: acc.account.id }
+        : { success: false, email_id: String(uid), folder: openFolder, account_id: acc.account.id, error: errors[i] }
+    );
     const marked = results.filter((r) => r.success).length;
     return {
       success: marked === results.length,
@@ -574,9 +688,23 @@ async function markEmails({ email_ids, mark_as, folder = "INBOX", account_id = "
   });
 }
 
-async function _findTrashFolder(client, preferredName) {
+// Resolved trash folder per (account, preferred name). The folder list
+// practically never changes within a process, so LIST is sent once. Only
+// folders LIST actually reported are remembered: a guessed name may not
+// exist yet, and caching it would pin every later delete to it.
+const _trashFolders = new Map();
+
+async function _findTrashFolder(client, account, preferredName) {
   const pref = String(preferredName || "").trim();
-  let fallback = pref || "Trash";
+  const key = `${account.id}\u0000${pref}`;
+  if (_trashFolders.has(key)) return _trashFolders.get(key);
+  const found = await _scanTrashFolder(client);
+  if (found) _trashFolders.set(key, found);
+  return found || pref || "Trash";
+}
+
+async function _scanTrashFolder(client) {
+  let fallback = "";
   const listResult = await client.list();
   const iterate = listResult && typeof listResult[Symbol.asyncIterator] === "function"
     ? listResult
@@ -613,23 +741,20 @@ async function deleteEmails({ email_ids, folder = "INBOX", permanent = false, tr
   const openFolder = _normalizeFolder(folder);
 
   return withImapClient(acc.account, async (client) => {
-    await client.mailboxOpen(openFolder);
+    await _openMailbox(client, openFolder);
     const uids = ids.map((x) => Number(x));
-    const results = [];
 
     let trashName = "";
-    if (!permanent) trashName = await _findTrashFolder(client, trash_folder);
+    if (!permanent) trashName = await _findTrashFolder(client, acc.account, trash_folder);
 
-    for (const uid of uids) {
-      try {
-        // eslint-disable-next-line no-await-in-loop
-        if (permanent) await client.messageDelete(uid, { uid: true });
-        else await client.messageMove(uid, trashName, { uid: true });
-        results.push({ success: true, email_id: String(uid), folder: openFolder, account_id: acc.account.id });
-      } catch (e) {
-        results.push({ success: false, email_id: String(uid), folder: openFolder, account_id: acc.account.id, error: e && e.message ? e.message : "failed" });
-      }
-    }
+    const errors = await _applyToUids(uids, (range) =>
+      permanent ? client.messageDelete(range, { uid: true }) : client.messageMove(range, trashName, { uid: true })
+    );
+    const results = uids.map((uid, i) =>
+      errors[i] === null
+        ? { success: true, email_id: String(uid), folder: openFolder, account_id: acc.account.id }
+        : { success: false, email_id: String(uid), folder: openFolder, account_id: acc.account.id, error: errors[i] }
+    );
     const deleted = results.filter((r) => r.success).length;
     return {
       success: deleted === results.length,
@@ -777,13 +902,13 @@ async function listFolders({ account_id } = {}) {
 }
 
 async function downloadAttachments({ email_id, folder = "INBOX", account_id, output_dir = "" } = {}) {
-  const detail = await showEmail({ email_id, folder, account_id });
-  if (!detail.success) return detail;
-
   const targetDir = output_dir ? String(output_dir) : paths.getPathConfig().attachmentsDir;
-  fs.mkdirSync(targetDir, { recursive: true });
 
   if (_isTestMode()) {
+    const detail = await showEmail({ email_id, folder, account_id });
+    if (!detail.success) return detail;
+    fs.mkdirSync(targetDir, { recursive: true });
+
     const acc = accounts.getAccountByIdOrEmail(account_id);
     if (!acc.success) return acc;
     const { getMailbox } = require("../testing/mock_store");
@@ -818,13 +943,23 @@ async function downloadAttachments({ email_id, folder = "INBOX", account_id, out
   const uid = Number(email_id);
   if (!Number.isFinite(uid)) return { success: false, error: "Invalid email_id" };
 
+  // One FETCH of the raw message: it both proves the email exists and
+  // carries the attachments (no showEmail round trip first).
   return withImapClient(acc.account, async (client) => {
-    await client.mailboxOpen(openFolder);
+    await _openMailbox(client, openFolder);
     const msg = await client.fetchOne(uid, { source: true, envelope: true }, { uid: true });
     if (!msg || !msg.source) return { success: false, error: `Email not found: ${email_id}` };
+    fs.mkdirSync(targetDir, { recursive: true });
 
     const { simpleParser } = require("mailparser");
-    const parsed = await simpleParser(msg.source);
+    // Only the attachment parts are used: skip deriving text/html bodies and
+    // inlining cid: images into the HTML as data URIs.
+    const parsed = await simpleParser(msg.source, {
+      skipHtmlToText: true,
+      skipTextToHtml: true,
+      skipTextLinks: true,
+      skipImageLinks: true,
+    });
 
     const attachments = [];
     for (const a of parsed.attachments || []) {
@@ -876,7 +1011,7 @@ async function flagEmail({ email_id, set_flag, flag_type = "flagged", folder = "
   const set = Boolean(set_flag);
 
   return withImapClient(acc.account, async (client) => {
-    await client.mailboxOpen(openFolder);
+    await _openMailbox(client, openFolder);
     if (set) await client.messageFlagsAdd(uid, [flag], { uid: true });
     else await client.messageFlagsRemove(uid, [flag], { uid: true });
     return {
@@ -902,18 +1037,10 @@ async function moveEmails({ email_ids, target_folder, source_folder = "INBOX", a
   if (!acc.success) return acc;
 
   return withImapClient(acc.account, async (client) => {
-    await client.mailboxOpen(src);
-    const failed_ids = [];
-    let moved = 0;
-    for (const uid of ids) {
-      try {
-        // eslint-disable-next-line no-await-in-loop
-        await client.messageMove(uid, tgt, { uid: true });
-        moved += 1;
-      } catch {
-        failed_ids.push(String(uid));
-      }
-    }
+    await _openMailbox(client, src);
+    const errors = await _applyToUids(ids, (range) => client.messageMove(range, tgt, { uid: true }));
+    const failed_ids = ids.filter((uid, i) => errors[i] !== null).map(String);
+    const moved = ids.length - failed_ids.length;
     return {
       success: failed_ids.length === 0,
       message: `Moved ${moved}/${ids.length} emails to "${tgt}"`,
@@ -22,6 +22,24 @@ function firstAddress(list) {
   return "";
 }
 
+// Envelope address list -> "Name <a@x>, b@y". Names with separators are
+// quoted so the list splits back apart on top-level commas.
+function formatAddressList(list) {
+  if (!list) return "";
+  const arr = Array.isArray(list) ? list : [list];
+  const out = [];
+  for (const item of arr) {
+    if (!item) continue;
+    if (typeof item === "string") {
+      out.push(item);
+    } else if (item.address) {
+      const name = String(item.name || "").replace(/"/g, "");
+      out.push(name ? `${/[,;<>@]/.test(name) ? `"${name}"` : name} <${item.address}>` : item.address);
+    }
+  }
+  return out.join(", ");
+}
+
 function hasAttachmentsFromBodyStructure(node) {
   if (!node || typeof node !== "object") return false;
 
@@ -57,6 +75,7 @@ function formatSize(bytes) {
 module.exports = {
   formatDateTime,
   firstAddress,
+  formatAddressList,
   hasAttachmentsFromBodyStructure,
   formatSize,
 };
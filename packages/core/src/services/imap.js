@@ -2,13 +2,26 @@ function _isTestMode() {
   return String(process.env.MAILBOX_TEST_MODE || "").trim() === "1";
 }
 
-async function withImapClient(account, fn) {
+// Authenticated clients are kept for the life of the process, one per
+// (host, port, user), so back-to-back operations on an account (digest
+// fetching bodies one by one, sync/monitor daemons) skip TCP+TLS+LOGIN.
+// A pooled client serves one operation at a time; a concurrent caller for the
+// same account gets a one-off connection instead of waiting. Idle clients
+// never keep the process alive and are logged out after _POOL_IDLE_MS.
+const _POOL_IDLE_MS = 60 * 1000;
+const _pool = new Map();
+let _exitHookInstalled = false;
+
+function _poolKey(account) {
+  return `${account.imap.host}\u0000${account.imap.port}\u0000${account.email}`;
+}
+
+async function _connect(account) {
+  // Test mode pools the mock client exactly like a live one.
   if (_isTestMode()) {
     const { createMockImapClient } = require("../testing/mock_imap_client");
-    const client = createMockImapClient(account);
-    return fn(client);
+    return createMockImapClient(account);
   }
-
   const { ImapFlow } = require("imapflow");
   const client = new ImapFlow({
     host: account.imap.host,
@@ -19,42 +32,157 @@ async function withImapClient(account, fn) {
       pass: account.password,
     },
     logger: false,
+    // Auto-IDLE would hold a command open (and a timer) on idle pooled clients.
+    disableAutoIdle: true,
   });
-
   await client.connect();
+  return client;
+}
+
+async function _logout(client) {
   try {
-    return await fn(client);
-  } finally {
+    await client.logout();
+  } catch {
+    // ignore
+  }
+}
+
+function _setRef(client, ref) {
+  const socket = client && client.socket;
+  if (socket && typeof socket.ref === "function") {
+    if (ref) socket.ref();
+    else socket.unref();
+  }
+}
+
+function _dropPooled(key, entry) {
+  if (_pool.get(key) !== entry) return;
+  _pool.delete(key);
+  clearTimeout(entry.timer);
+  _setRef(entry.client, false);
+  _logout(entry.client);
+}
+
+async function _acquirePooled(key, account) {
+  const existing = _pool.get(key);
+  if (existing && !existing.busy && existing.client.usable !== false) {
+    clearTimeout(existing.timer);
+    existing.busy = true;
+    _setRef(existing.client, true);
+    return existing;
+  }
+  if (existing && !existing.busy) _dropPooled(key, existing);
+  if (_pool.has(key)) return null;
+
+  const entry = { client: null, busy: true, timer: null };
+  if (!_exitHookInstalled) {
+    _exitHookInstalled = true;
+    process.on("beforeExit", closeImapClients);
+  }
+  _pool.set(key, entry);
+  try {
+    entry.client = await _connect(account);
+  } catch (e) {
+    _pool.delete(key);
+    throw e;
+  }
+  // An idle pooled socket can still error or be closed by the server.
+  entry.client.on("error", () => _dropPooled(key, entry));
+  entry.client.on("close", () => _dropPooled(key, entry));
+  return entry;
+}
+
+function _releasePooled(key, entry) {
+  entry.busy = false;
+  if (entry.client.usable === false) {
+    _dropPooled(key, entry);
+    return;
+  }
+  _setRef(entry.client, false);
+  entry.timer = setTimeout(() => _dropPooled(key, entry), _POOL_IDLE_MS);
+  entry.timer.unref();
+}
+
+// Log out every idle pooled client. Runs on its own when the event loop
+// drains (library callers); the CLI exits via process.exit and leaves the
+// sockets to the OS instead.
+async function closeImapClients() {
+  await Promise.all(
+    [..._pool].map(([key, entry]) => {
+      if (entry.busy) return null;
+      _pool.delete(key);
+      clearTimeout(entry.timer);
+      // Hold the loop open until LOGOUT completes.
+      _setRef(entry.client, true);
+      return _logout(entry.client);
+    })
+  );
+}
+
+async function withImapClient(account, fn) {
+  const key = _poolKey(account);
+  const entry = await _acquirePooled(key, account);
+  if (entry) {
     try {
-      await client.logout();
-    } catch {
-      // ignore
+      return await fn(entry.client);
+    } finally {
+      _releasePooled(key, entry);
     }
   }
+
+  const client = await _connect(account);
+  try {
+    return await fn(client);
+  } finally {
+    // The caller already has its result; don't hold it for the LOGOUT round
+    // trip. _logout swallows errors, so nothing is left unhandled.
+    _logout(client);
+  }
+}
+
+// Run fn over items with at most `limit` in flight, preserving order. Bounds
+// how many accounts hold an IMAP session (and a page of results) at once.
+const IMAP_CONCURRENCY = 5;
+
+async function mapWithConcurrency(items, limit, fn) {
+  const list = Array.from(items || []);
+  const out = new Array(list.length);
+  let next = 0;
+  const worker = async () => {
+    while (next < list.length) {
+      const i = next++;
+      // eslint-disable-next-line no-await-in-loop
+      out[i] = await fn(list[i], i);
+    }
+  };
+  const n = Math.max(1, Math.min(Number(limit) || 1, list.length));
+  await Promise.all(Array.from({ length: n }, worker));
+  return out;
 }
 
 async function testConnection(account, folder) {
   const openFolder = String(folder || "INBOX") || "INBOX";
   return withImapClient(account, async (client) => {
-    const lock = typeof client.getMailboxLock === "function" ? await client.getMailboxLock(openFolder) : null;
-    try {
-      if (typeof client.mailboxOpen === "function") {
-        // Ensure mailbox is selected and mailbox stats are updated.
-        // eslint-disable-next-line no-await-in-loop
-        await client.mailboxOpen(openFolder);
-      }
-
-      const mb = client.mailbox || {};
-      const total = Number(mb.exists || 0);
-      const unseen = Number(mb.unseen || 0);
-      return { success: true, total_emails: total, unread_emails: unseen };
-    } finally {
-      if (lock && typeof lock.release === "function") lock.release();
+    const cur = client.mailbox;
+    if (cur && cur.path === openFolder) {
+      // A pooled client may already have the folder selected, and STATUS on
+      // the selected mailbox is discouraged (RFC 3501). A NOOP brings exists
+      // up to date; ImapFlow never refreshes unseen, so count it afresh.
+      await client.noop();
+      const unseen = await client.search({ seen: false }, { uid: true });
+      return { success: true, total_emails: Number(cur.exists || 0), unread_emails: unseen.length };
     }
+    // STATUS reports both counts in one command without selecting the
+    // mailbox (SELECT can be slow on very large folders).
+    const st = await client.status(openFolder, { messages: true, unseen: true });
+    return { success: true, total_emails: Number(st.messages || 0), unread_emails: Number(st.unseen || 0) };
   });
 }
 
 module.exports = {
+  IMAP_CONCURRENCY,
+  closeImapClients,
+  mapWithConcurrency,
   withImapClient,
   testConnection,
 };
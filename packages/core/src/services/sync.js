@@ -1,7 +1,10 @@
 const fs = require("fs");
+const path = require("path");
 
 const { paths } = require("@mailbox/shared");
 const accounts = require("./accounts");
+const email = require("./email");
+const { IMAP_CONCURRENCY, mapWithConcurrency } = require("./imap");
 const syncDb = require("../storage/sync_db");
 
 function _nowIso() {
@@ -16,6 +19,19 @@ function _safeStatSize(p) {
   }
 }
 
+// Database size for status(): re-stat at most every few seconds while
+// `sync watch` polls. force() drops the memo after writing the file.
+const _DB_SIZE_TTL_MS = 5000;
+let _dbSizeMemo = null;
+
+function _databaseSize(p) {
+  const now = performance.now();
+  if (_dbSizeMemo && _dbSizeMemo.path === p && now - _dbSizeMemo.at < _DB_SIZE_TTL_MS) return _dbSizeMemo.size;
+  const size = _safeStatSize(p);
+  _dbSizeMemo = { path: p, size, at: now };
+  return size;
+}
+
 function _readJson(p) {
   try {
     if (!fs.existsSync(p)) return null;
@@ -26,7 +42,7 @@ function _readJson(p) {
 }
 
 function _writeJson(p, value) {
-  fs.mkdirSync(require("path").dirname(p), { recursive: true });
+  fs.mkdirSync(path.dirname(p), { recursive: true });
   fs.writeFileSync(p, JSON.stringify(value, null, 2) + "\n", "utf8");
 }
 
@@ -38,14 +54,35 @@ function _loadSyncState() {
   return { statePath, state: { last_sync_times: { incremental: null, full: null }, accounts: {} } };
 }
 
+// `sync watch` polls status(); reuse the parsed state file until its
+// mtime/size changes instead of re-reading and re-parsing it every tick.
+let _stateMemo = null;
+
+function _loadSyncStateForRead() {
+  const statePath = paths.getPathConfig().syncHealthHistoryJson;
+  let key = "";
+  try {
+    const st = fs.statSync(statePath);
+    key = `${st.mtimeMs}:${st.size}`;
+  } catch {
+    // missing file: fall through with an empty key
+  }
+  if (_stateMemo && _stateMemo.statePath === statePath && _stateMemo.key === key) return _stateMemo.state;
+  const { state } = _loadSyncState();
+  _stateMemo = { statePath, key, state };
+  return state;
+}
+
 function status() {
   const pc = paths.getPathConfig();
   const all = accounts.getAllAccountsResolved();
   if (!all.success) return all;
-  const { state } = _loadSyncState();
+  const state = _loadSyncStateForRead();
 
+  let total_emails = 0;
   const outAccounts = (all.accounts || []).map((a) => {
     const per = state.accounts && state.accounts[a.id] ? state.accounts[a.id] : {};
+    total_emails += Number(per.total_emails || 0);
     return {
       id: a.id,
       email: a.email,
@@ -63,8 +100,8 @@ function status() {
     last_sync_times: state.last_sync_times || { incremental: null, full: null },
     next_jobs: [],
     accounts: outAccounts,
-    total_emails: outAccounts.reduce((s, a) => s + Number(a.total_emails || 0), 0),
-    database_size: _safeStatSize(pc.emailSyncDb),
+    total_emails,
+    database_size: _databaseSize(pc.emailSyncDb),
   };
 }
 
@@ -73,7 +110,7 @@ async function force({ account_id = "", full = false } = {}) {
   // Ensure sqlite schema exists and is writable.
   try {
     if (!fs.existsSync(pc.emailSyncDb)) {
-      fs.mkdirSync(require("path").dirname(pc.emailSyncDb), { recursive: true });
+      fs.mkdirSync(path.dirname(pc.emailSyncDb), { recursive: true });
       fs.writeFileSync(pc.emailSyncDb, Buffer.from([]));
     }
   } catch {
@@ -91,43 +128,60 @@ async function force({ account_id = "", full = false } = {}) {
   const started = Date.now();
   const { statePath, state } = _loadSyncState();
 
-  const results = [];
-  for (const a of target) {
-    const email = require("./email");
+  // Fetch every account first, then write all of them to the cache in one
+  // transaction (one file read/flush per run instead of per account). The
+  // fetches are pure network wait on different servers, so they run
+  // concurrently (a few at a time); results keep the account order.
+  const fetched = await mapWithConcurrency(target, IMAP_CONCURRENCY, async (a) => {
     try {
-      // eslint-disable-next-line no-await-in-loop
       const listRes = await email.listEmails({ limit: 200, offset: 0, unread_only: false, folder: "INBOX", account_id: a.id, use_cache: false });
+      return { account: a, listRes };
+    } catch (e) {
+      return { account: a, error: e && e.message ? e.message : "sync failed" };
+    }
+  });
 
-      // Update cache DB for this account+folder.
-      // eslint-disable-next-line no-await-in-loop
-      await syncDb.upsertAccount({ dbPath: pc.emailSyncDb, id: a.id, email: a.email, provider: a.provider || "custom" });
-      // eslint-disable-next-line no-await-in-loop
-      const folderRes = await syncDb.upsertFolder({
-        dbPath: pc.emailSyncDb,
-        accountId: a.id,
+  const ok = fetched.filter((f) => !f.error);
+  const writeRes = await syncDb.syncFolders({
+    dbPath: pc.emailSyncDb,
+    steps: ok.map(({ account: a, listRes }) => ({
+      account: { id: a.id, email: a.email, provider: a.provider || "custom" },
+      folder: {
         name: "INBOX",
         displayName: "INBOX",
         messageCount: listRes.total_in_folder || 0,
         unreadCount: listRes.unread_count || 0,
         lastSyncIso: _nowIso(),
-      });
-      if (folderRes && folderRes.success) {
-        // eslint-disable-next-line no-await-in-loop
-        await syncDb.upsertEmails({ dbPath: pc.emailSyncDb, accountId: a.id, folderId: folderRes.folderId, emails: listRes.emails || [] });
-      }
-
-      const per = {
-        last_sync: _nowIso(),
-        total_emails: listRes.total_in_folder || 0,
-        sync_status: listRes.success ? "ok" : "error",
-      };
-      if (!state.accounts) state.accounts = {};
-      state.accounts[a.id] = per;
-      results.push({ success: true, account_id: a.id, folders_synced: 1, emails_added: 0, emails_updated: 0 });
-    } catch (e) {
-      results.push({ success: false, account_id: a.id, error: e && e.message ? e.message : "sync failed" });
-    }
-  }
+      },
+      syncType: full ? "full" : "incremental",
+      emails: listRes.emails || [],
+    })),
+    // Full syncs are the periodic heavy job; return freed pages to the OS
+    // then, inside the same transaction and flush.
+    vacuumPages: full ? 1000 : 0,
+  });
+  _dbSizeMemo = null;
+  const writes = new Map(ok.map((f, i) => [f, writeRes.success ? writeRes.results[i] : writeRes]));
+
+  const results = fetched.map((f) => {
+    const a = f.account;
+    if (f.error) return { success: false, account_id: a.id, error: f.error };
+    const upsertRes = writes.get(f);
+    if (!state.accounts) state.accounts = {};
+    state.accounts[a.id] = {
+      last_sync: _nowIso(),
+      total_emails: f.listRes.total_in_folder || 0,
+      sync_status: f.listRes.success && upsertRes.success ? "ok" : "error",
+    };
+    if (!upsertRes.success) return { success: false, account_id: a.id, error: upsertRes.error || "cache write failed" };
+    return {
+      success: true,
+      account_id: a.id,
+      folders_synced: 1,
+      emails_added: upsertRes.added,
+      emails_updated: upsertRes.updated,
+    };
+  });
 
   state.last_sync_times = state.last_sync_times || { incremental: null, full: null };
   state.last_sync_times[full ? "full" : "incremental"] = _nowIso();
@@ -137,7 +191,13 @@ async function force({ account_id = "", full = false } = {}) {
   if (account_id) {
     const one = results[0] || { success: false, error: "No account matched" };
     if (!one.success) return { success: false, error: one.error || "sync failed" };
-    return { success: true, account_id: one.account_id, folders_synced: one.folders_synced || 0, emails_added: 0, emails_updated: 0 };
+    return {
+      success: true,
+      account_id: one.account_id,
+      folders_synced: one.folders_synced || 0,
+      emails_added: one.emails_added || 0,
+      emails_updated: one.emails_updated || 0,
+    };
   }
 
   const okCount = results.filter((r) => r.success).length;
@@ -145,8 +205,8 @@ async function force({ account_id = "", full = false } = {}) {
     success: okCount === results.length,
     accounts_synced: okCount,
     total_accounts: results.length,
-    emails_added: 0,
-    emails_updated: 0,
+    emails_added: results.reduce((s, r) => s + Number(r.emails_added || 0), 0),
+    emails_updated: results.reduce((s, r) => s + Number(r.emails_updated || 0), 0),
     sync_time,
     results,
   };
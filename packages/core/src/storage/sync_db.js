@@ -1,13 +1,21 @@
+const crypto = require("crypto");
 const fs = require("fs");
 const path = require("path");
 
-// Use asm.js build to avoid shipping wasm assets.
-const initSqlJs = require("sql.js/dist/sql-asm.js");
-
 let _sqlPromise = null;
 
+// Prefer the WebAssembly build: the sync write path runs several times faster
+// than under asm.js. Packaged (pkg) binaries don't ship the .wasm asset, so
+// they load the asm.js build directly rather than failing into it (a failed
+// wasm load prints Emscripten's abort message to stderr).
 async function _getSQL() {
-  if (!_sqlPromise) _sqlPromise = initSqlJs();
+  if (!_sqlPromise) {
+    _sqlPromise = process.pkg
+      ? require("sql.js/dist/sql-asm.js")()
+      : Promise.resolve()
+          .then(() => require("sql.js/dist/sql-wasm.js")())
+          .catch(() => require("sql.js/dist/sql-asm.js")());
+  }
   return _sqlPromise;
 }
 
@@ -26,183 +34,615 @@ function _writeDbFile(dbPath, bytes) {
   fs.writeFileSync(dbPath, Buffer.from(bytes));
 }
 
+// Matches Python schema in src/database/email_sync_db.py. Applied as one
+// script in one transaction: a single parse pass and a single commit, rather
+// than a prepare/step/finalize round trip per IF NOT EXISTS statement.
+const _SCHEMA_SQL = `
+  BEGIN;
+
+  CREATE TABLE IF NOT EXISTS accounts (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    provider TEXT NOT NULL,
+    last_sync TIMESTAMP,
+    total_emails INTEGER DEFAULT 0,
+    sync_status TEXT DEFAULT 'never',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  );
+
+  CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    display_name TEXT,
+    message_count INTEGER DEFAULT 0,
+    unread_count INTEGER DEFAULT 0,
+    last_sync TIMESTAMP,
+    FOREIGN KEY (account_id) REFERENCES accounts (id),
+    UNIQUE(account_id, name)
+  );
+
+  -- Plain INTEGER PRIMARY KEY (no AUTOINCREMENT): ids stay stable for the FTS
+  -- rowid and email_recipients, without a sqlite_sequence write per insert.
+  CREATE TABLE IF NOT EXISTS emails (
+    id INTEGER PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    folder_id INTEGER NOT NULL,
+    uid TEXT NOT NULL,
+    message_id TEXT,
+    subject TEXT,
+    sender TEXT,
+    sender_email TEXT,
+    recipients TEXT,
+    date_sent TIMESTAMP,
+    date_sent_epoch INTEGER,
+    date_received TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_read BOOLEAN DEFAULT FALSE,
+    is_flagged BOOLEAN DEFAULT FALSE,
+    is_deleted BOOLEAN DEFAULT FALSE,
+    has_attachments BOOLEAN DEFAULT FALSE,
+    size_bytes INTEGER DEFAULT 0,
+    content_hash BLOB,
+    sync_status TEXT DEFAULT 'synced',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (account_id) REFERENCES accounts (id),
+    FOREIGN KEY (folder_id) REFERENCES folders (id),
+    UNIQUE(account_id, folder_id, uid)
+  );
+
+  CREATE TABLE IF NOT EXISTS email_content (
+    email_id INTEGER PRIMARY KEY,
+    plain_text TEXT,
+    html_text TEXT,
+    headers TEXT,
+    raw_size INTEGER,
+    content_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE CASCADE
+  );
+
+  CREATE TABLE IF NOT EXISTS attachments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email_id INTEGER NOT NULL,
+    filename TEXT,
+    content_type TEXT,
+    size_bytes INTEGER DEFAULT 0,
+    content_id TEXT,
+    is_inline BOOLEAN DEFAULT FALSE,
+    data BLOB,
+    file_path TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE CASCADE
+  );
+
+  -- One row per To/Cc address, so "mail sent to X" is an index probe rather
+  -- than a scan + JSON parse of emails.recipients (kept for the Python
+  -- writer). Clustered on (email_id, kind, idx): no rowid b-tree and no
+  -- separate email_id index to maintain.
+  CREATE TABLE IF NOT EXISTS email_recipients (
+    email_id INTEGER NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('to', 'cc', 'bcc')),
+    idx INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    name TEXT,
+    PRIMARY KEY (email_id, kind, idx),
+    FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE CASCADE
+  ) WITHOUT ROWID;
+
+  CREATE TABLE IF NOT EXISTS sync_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id TEXT NOT NULL,
+    folder_name TEXT,
+    sync_type TEXT,
+    start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    end_time TIMESTAMP,
+    emails_added INTEGER DEFAULT 0,
+    emails_updated INTEGER DEFAULT 0,
+    emails_deleted INTEGER DEFAULT 0,
+    status TEXT DEFAULT 'running',
+    error_message TEXT,
+    FOREIGN KEY (account_id) REFERENCES accounts (id)
+  );
+
+  CREATE INDEX IF NOT EXISTS idx_emails_account_folder ON emails (account_id, folder_id);
+  CREATE INDEX IF NOT EXISTS idx_emails_uid ON emails (uid);
+  CREATE INDEX IF NOT EXISTS idx_emails_message_id ON emails (message_id);
+  CREATE INDEX IF NOT EXISTS idx_emails_sender_email ON emails (sender_email);
+  CREATE INDEX IF NOT EXISTS idx_folders_account ON folders (account_id);
+  CREATE INDEX IF NOT EXISTS idx_sync_history_account ON sync_history (account_id);
+  CREATE INDEX IF NOT EXISTS idx_attachments_email ON attachments (email_id);
+  CREATE INDEX IF NOT EXISTS idx_email_recipients_address ON email_recipients (address);
+  CREATE INDEX IF NOT EXISTS idx_emails_dedup ON emails (message_id, account_id, id DESC) WHERE is_deleted = 0;
+
+  -- Per-run counters: while a sync_history row is 'running' for an account,
+  -- inserts and (changed-row) upserts into emails bump it in the same
+  -- statement, so writers never track was-new themselves.
+  CREATE TRIGGER IF NOT EXISTS sync_history_count_added AFTER INSERT ON emails BEGIN
+    UPDATE sync_history SET emails_added = emails_added + 1
+    WHERE id = (SELECT MAX(id) FROM sync_history WHERE account_id = NEW.account_id AND status = 'running');
+  END;
+  CREATE TRIGGER IF NOT EXISTS sync_history_count_updated AFTER UPDATE ON emails BEGIN
+    UPDATE sync_history SET emails_updated = emails_updated + 1
+    WHERE id = (SELECT MAX(id) FROM sync_history WHERE account_id = NEW.account_id AND status = 'running');
+  END;
+
+  COMMIT;
+`;
+
+// Files created before date_sent_epoch existed get the column and a one-off
+// backfill; indexes on it are created only once the column is there.
+const _EPOCH_MIGRATION_SQL = `
+  BEGIN;
+  ALTER TABLE emails ADD COLUMN date_sent_epoch INTEGER;
+  UPDATE emails SET date_sent_epoch = CAST(strftime('%s', date_sent) AS INTEGER);
+  COMMIT;
+`;
+
+const _EPOCH_INDEX_SQL = `
+  -- Superseded by the partial epoch indexes below; dropping it saves a b-tree write per upsert.
+  DROP INDEX IF EXISTS idx_emails_date_sent;
+  -- Search is substring/prefix (FTS or LIKE '%q%'), never subject equality,
+  -- so this index was pure write cost.
+  DROP INDEX IF EXISTS idx_emails_subject;
+  -- Serve the cache list/search ORDER BY ... LIMIT without a temp b-tree, across
+  -- all accounts or within one. Deleted rows are never listed. The per-account
+  -- index also carries every column the list totals and dedup subquery read
+  -- (is_deleted too, or the planner won't treat it as covering), so those
+  -- counts never touch the table.
+  CREATE INDEX IF NOT EXISTS idx_emails_active_recent ON emails (date_sent_epoch DESC) WHERE is_deleted = 0;
+  CREATE INDEX IF NOT EXISTS idx_emails_active_cover
+    ON emails (account_id, date_sent_epoch DESC, folder_id, is_read, message_id, is_deleted) WHERE is_deleted = 0;
+  -- Unread/flagged are small subsets: partial indexes stay tiny and most
+  -- upserts skip them, unlike the full boolean indexes they replace.
+  DROP INDEX IF EXISTS idx_emails_is_read;
+  DROP INDEX IF EXISTS idx_emails_is_flagged;
+  -- Duplicate of the emails table's UNIQUE(account_id, folder_id, uid)
+  -- autoindex, which is the upsert's ON CONFLICT target.
+  DROP INDEX IF EXISTS uniq_emails_account_folder_uid;
+  CREATE INDEX IF NOT EXISTS idx_emails_unread ON emails (account_id, date_sent_epoch DESC) WHERE is_read = 0 AND is_deleted = 0;
+  CREATE INDEX IF NOT EXISTS idx_emails_flagged ON emails (account_id, date_sent_epoch DESC) WHERE is_flagged = 1 AND is_deleted = 0;
+`;
+
 function _ensureSchema(db) {
-  // Matches Python schema in src/database/email_sync_db.py
-  db.run(`
-    CREATE TABLE IF NOT EXISTS accounts (
-      id TEXT PRIMARY KEY,
-      email TEXT UNIQUE NOT NULL,
-      provider TEXT NOT NULL,
-      last_sync TIMESTAMP,
-      total_emails INTEGER DEFAULT 0,
-      sync_status TEXT DEFAULT 'never',
-      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-  `);
-
-  db.run(`
-    CREATE TABLE IF NOT EXISTS folders (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      account_id TEXT NOT NULL,
-      name TEXT NOT NULL,
-      display_name TEXT,
-      message_count INTEGER DEFAULT 0,
-      unread_count INTEGER DEFAULT 0,
-      last_sync TIMESTAMP,
-      FOREIGN KEY (account_id) REFERENCES accounts (id),
-      UNIQUE(account_id, name)
-    );
-  `);
-
-  db.run(`
-    CREATE TABLE IF NOT EXISTS emails (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      account_id TEXT NOT NULL,
-      folder_id INTEGER NOT NULL,
-      uid TEXT NOT NULL,
-      message_id TEXT,
-      subject TEXT,
-      sender TEXT,
-      sender_email TEXT,
-      recipients TEXT,
-      date_sent TIMESTAMP,
-      date_received TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-      is_read BOOLEAN DEFAULT FALSE,
-      is_flagged BOOLEAN DEFAULT FALSE,
-      is_deleted BOOLEAN DEFAULT FALSE,
-      has_attachments BOOLEAN DEFAULT FALSE,
-      size_bytes INTEGER DEFAULT 0,
-      content_hash TEXT,
-      sync_status TEXT DEFAULT 'synced',
-      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-      FOREIGN KEY (account_id) REFERENCES accounts (id),
-      FOREIGN KEY (folder_id) REFERENCES folders (id),
-      UNIQUE(account_id, folder_id, uid)
-    );
-  `);
-
-  db.run(`
-    CREATE TABLE IF NOT EXISTS email_content (
-      email_id INTEGER PRIMARY KEY,
-      plain_text TEXT,
-      html_text TEXT,
-      headers TEXT,
-      raw_size INTEGER,
-      content_loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-      FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE CASCADE
-    );
-  `);
-
-  db.run(`
-    CREATE TABLE IF NOT EXISTS attachments (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      email_id INTEGER NOT NULL,
-      filename TEXT,
-      content_type TEXT,
-      size_bytes INTEGER DEFAULT 0,
-      content_id TEXT,
-      is_inline BOOLEAN DEFAULT FALSE,
-      data BLOB,
-      file_path TEXT,
-      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-      FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE CASCADE
-    );
-  `);
-
-  db.run(`
-    CREATE TABLE IF NOT EXISTS sync_history (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      account_id TEXT NOT NULL,
-      folder_name TEXT,
-      sync_type TEXT,
-      start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-      end_time TIMESTAMP,
-      emails_added INTEGER DEFAULT 0,
-      emails_updated INTEGER DEFAULT 0,
-      emails_deleted INTEGER DEFAULT 0,
-      status TEXT DEFAULT 'running',
-      error_message TEXT,
-      FOREIGN KEY (account_id) REFERENCES accounts (id)
-    );
-  `);
-
-  const indexes = [
-    "CREATE INDEX IF NOT EXISTS idx_emails_account_folder ON emails (account_id, folder_id)",
-    "CREATE INDEX IF NOT EXISTS idx_emails_uid ON emails (uid)",
-    "CREATE INDEX IF NOT EXISTS idx_emails_message_id ON emails (message_id)",
-    "CREATE INDEX IF NOT EXISTS idx_emails_date_sent ON emails (date_sent)",
-    "CREATE INDEX IF NOT EXISTS idx_emails_is_read ON emails (is_read)",
-    "CREATE INDEX IF NOT EXISTS idx_emails_is_flagged ON emails (is_flagged)",
-    "CREATE INDEX IF NOT EXISTS idx_emails_subject ON emails (subject)",
-    "CREATE INDEX IF NOT EXISTS idx_emails_sender_email ON emails (sender_email)",
-    "CREATE INDEX IF NOT EXISTS idx_folders_account ON folders (account_id)",
-    "CREATE INDEX IF NOT EXISTS idx_sync_history_account ON sync_history (account_id)",
-    "CREATE INDEX IF NOT EXISTS idx_attachments_email ON attachments (email_id)",
-    "CREATE UNIQUE INDEX IF NOT EXISTS uniq_emails_account_folder_uid ON emails (account_id, folder_id, uid)",
-  ];
-  for (const sql of indexes) db.run(sql);
+  db.exec(_SCHEMA_SQL);
+  const hasEpoch = _execRows(db, "PRAGMA table_info(emails)", null).some((col) => col[1] === "date_sent_epoch");
+  if (!hasEpoch) db.exec(_EPOCH_MIGRATION_SQL);
+  db.exec(_EPOCH_INDEX_SQL);
+}
+
+// date_sent is stored as naive "YYYY-MM-DD HH:MM:SS" text. The epoch column
+// reads it as UTC, exactly like SQLite's strftime('%s', ...) in the backfill,
+// so it is an order-preserving integer key rather than a true instant.
+function _epochSeconds(text) {
+  const value = String(text || "").trim();
+  if (!value) return null;
+  let ms;
+  if (/^\d{4}-\d{2}-\d{2}$/.test(value)) ms = Date.parse(`${value}T00:00:00Z`);
+  else if (/^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$/.test(value)) ms = Date.parse(`${value.replace(" ", "T")}Z`);
+  else ms = Date.parse(value);
+  return Number.isNaN(ms) ? null : Math.floor(ms / 1000);
+}
+
+// Full-text index over the header columns searched from the cache. sql.js
+// builds differ in which FTS modules they compile in, so probe FTS5 first,
+// then FTS4; without either, search falls back to LIKE scans.
+const _FTS_TRIGGERS = {
+  fts5: [
+    `CREATE TRIGGER IF NOT EXISTS emails_fts_ai AFTER INSERT ON emails BEGIN
+      INSERT INTO emails_fts (rowid, subject, sender, sender_email) VALUES (new.id, new.subject, new.sender, new.sender_email);
+    END`,
+    `CREATE TRIGGER IF NOT EXISTS emails_fts_ad AFTER DELETE ON emails BEGIN
+      INSERT INTO emails_fts (emails_fts, rowid, subject, sender, sender_email) VALUES ('delete', old.id, old.subject, old.sender, old.sender_email);
+    END`,
+    `CREATE TRIGGER IF NOT EXISTS emails_fts_au AFTER UPDATE OF subject, sender, sender_email ON emails BEGIN
+      INSERT INTO emails_fts (emails_fts, rowid, subject, sender, sender_email) VALUES ('delete', old.id, old.subject, old.sender, old.sender_email);
+      INSERT INTO emails_fts (rowid, subject, sender, sender_email) VALUES (new.id, new.subject, new.sender, new.sender_email);
+    END`,
+  ],
+  fts4: [
+    `CREATE TRIGGER IF NOT EXISTS emails_fts_ai AFTER INSERT ON emails BEGIN
+      INSERT INTO emails_fts (docid, subject, sender, sender_email) VALUES (new.id, new.subject, new.sender, new.sender_email);
+    END`,
+    `CREATE TRIGGER IF NOT EXISTS emails_fts_bd BEFORE DELETE ON emails BEGIN
+      DELETE FROM emails_fts WHERE docid = old.id;
+    END`,
+    `CREATE TRIGGER IF NOT EXISTS emails_fts_bu BEFORE UPDATE OF subject, sender, sender_email ON emails BEGIN
+      DELETE FROM emails_fts WHERE docid = old.id;
+    END`,
+    `CREATE TRIGGER IF NOT EXISTS emails_fts_au AFTER UPDATE OF subject, sender, sender_email ON emails BEGIN
+      INSERT INTO emails_fts (docid, subject, sender, sender_email) VALUES (new.id, new.subject, new.sender, new.sender_email);
+    END`,
+  ],
+};
+
+const _FTS_CREATE = {
+  fts5: "CREATE VIRTUAL TABLE emails_fts USING fts5(subject, sender, sender_email, content='emails', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+  fts4: "CREATE VIRTUAL TABLE emails_fts USING fts4(subject, sender, sender_email, content='emails', tokenize=unicode61 \"remove_diacritics=2\")",
+};
+
+function _ftsMode(db) {
+  const existing = _execScalar(db, "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'");
+  if (!existing) return "";
+  return /fts5/i.test(existing) ? "fts5" : "fts4";
+}
+
+function _ensureFts(db) {
+  const existing = _ftsMode(db);
+  if (existing) return existing;
+
+  for (const mod of ["fts5", "fts4"]) {
+    try {
+      db.run(_FTS_CREATE[mod]);
+    } catch {
+      continue;
+    }
+    for (const sql of _FTS_TRIGGERS[mod]) db.run(sql);
+    // Index rows cached before the FTS table existed.
+    db.run("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')");
+    return mod;
+  }
+  return "";
+}
+
+// Turn free text into a prefix query: every term must match the start of a
+// token in subject/sender/sender_email. Quoting keeps FTS operators inert.
+// Returns "" (LIKE fallback) when the query has no letters/digits to match,
+// or contains CJK: unicode61 keeps a CJK run as one token, so a substring of
+// it would never match.
+const _CJK_RE = /[\p{Script=Han}\p{Script=Hiragana}\p{Script=Katakana}\p{Script=Hangul}]/u;
+
+function _ftsQuery(mod, text) {
+  const value = String(text || "");
+  if (!/[\p{L}\p{N}]/u.test(value) || _CJK_RE.test(value)) return "";
+  const terms = value
+    .split(/\s+/)
+    .filter(Boolean)
+    .map((t) => t.replace(/"/g, '""'));
+  if (!terms.length) return "";
+  return terms.map((t) => (mod === "fts5" ? `"${t}"*` : `"${t}*"`)).join(" ");
+}
+
+// Prepared statements are cached per database keyed by SQL text, so repeat
+// queries on the same handle skip SQLite's parse/plan step. Cached
+// statements are reset (not freed) after use; db.close() frees them all.
+const _STMT_CACHE_MAX = 64;
+const _stmtCaches = new WeakMap();
+
+function _prepare(db, sql) {
+  let cache = _stmtCaches.get(db);
+  if (!cache) {
+    cache = new Map();
+    _stmtCaches.set(db, cache);
+  }
+  let stmt = cache.get(sql);
+  if (stmt) {
+    cache.delete(sql);
+  } else {
+    stmt = db.prepare(sql);
+    if (cache.size >= _STMT_CACHE_MAX) {
+      const oldest = cache.keys().next().value;
+      cache.get(oldest).free();
+      cache.delete(oldest);
+    }
+  }
+  cache.set(sql, stmt);
+  return stmt;
 }
 
 function _execScalar(db, sql, params) {
-  const stmt = db.prepare(sql);
+  return _stmtScalar(_prepare(db, sql), params);
+}
+
+// First column of the first row from an already-prepared statement; loops
+// hold the statement across iterations and skip the per-call cache lookup.
+function _stmtScalar(stmt, params) {
   try {
     if (params) stmt.bind(params);
     if (!stmt.step()) return null;
     const row = stmt.get();
     return row && row.length ? row[0] : null;
   } finally {
-    stmt.free();
+    stmt.reset();
   }
 }
 
-function _execRows(db, sql, params) {
-  const stmt = db.prepare(sql);
+// Yields each row's positional value array straight off the statement, so
+// callers that reshape rows never hold an intermediate array of all rows.
+// Breaking out of the loop still resets the statement (generator return).
+function* _iterRows(db, sql, params) {
+  const stmt = _prepare(db, sql);
   try {
     if (params) stmt.bind(params);
-    const cols = stmt.getColumnNames();
-    const rows = [];
-    while (stmt.step()) {
-      const values = stmt.get();
-      const obj = {};
-      for (let i = 0; i < cols.length; i += 1) obj[cols[i]] = values[i];
-      rows.push(obj);
-    }
-    return rows;
+    while (stmt.step()) yield stmt.get();
   } finally {
-    stmt.free();
+    stmt.reset();
   }
 }
 
-async function openSyncDb(dbPath) {
+// Rows come back as positional value arrays (SELECT-list order); callers
+// destructure them instead of paying for a { column: value } object per row.
+function _execRows(db, sql, params) {
+  return Array.from(_iterRows(db, sql, params));
+}
+
+// Change-detection hash over the immutable header fields (Python parity:
+// message_id + subject + sender_email + date_sent). Not a security boundary,
+// so BLAKE2b truncated to 128 bits is plenty and is stored as a 16-byte BLOB.
+// Syncs re-see the same messages every run, so recent tuples are memoized
+// (bounded, LRU order).
+const _HASH_CACHE_MAX = 8192;
+
+// crypto.hash (Node >= 20.12) is a one-shot digest that skips allocating a
+// Hash object per call; older runtimes take the createHash path.
+const _blake2b =
+  typeof crypto.hash === "function"
+    ? (input) => crypto.hash("blake2b512", input, "buffer")
+    : (input) => crypto.createHash("blake2b512").update(input).digest();
+const _hashCache = new Map();
+
+function _contentHash(messageId, subject, senderEmail, dateSent) {
+  const key = `${messageId}\u0000${subject}\u0000${senderEmail}\u0000${dateSent}`;
+  const hit = _hashCache.get(key);
+  if (hit !== undefined) {
+    _hashCache.delete(key);
+    _hashCache.set(key, hit);
+    return hit;
+  }
+  const digest = _blake2b(`${messageId}${subject}${senderEmail}${dateSent}`).subarray(0, 16);
+  _hashCache.set(key, digest);
+  if (_hashCache.size > _HASH_CACHE_MAX) _hashCache.delete(_hashCache.keys().next().value);
+  return digest;
+}
+
+// Per-connection settings, applied in one exec. The image already lives in
+// the sql.js heap and durability comes from flush() rewriting the file after
+// COMMIT, so the rollback journal and fsyncs on the emulated file layer buy
+// nothing: keep the journal in memory and skip syncs. mmap_size has nothing
+// to map; temp b-trees (dedup GROUP BY, sorts) stay in memory too. The page
+// cache may grow to 64 MiB (allocated only as pages are touched).
+const _CONNECTION_PRAGMAS = `
+  PRAGMA journal_mode = MEMORY;
+  PRAGMA synchronous = OFF;
+  PRAGMA temp_store = MEMORY;
+  PRAGMA cache_size = -65536;
+`;
+
+// Bumped whenever _ensureSchema/_ensureFts gain a step. Stored in the file's
+// user_version once a writer has applied them.
+const _SCHEMA_VERSION = 1;
+
+// Only writers migrate (migrate: true): their DDL lands in the file with the
+// writer's flush. Readers open the image as-is and report its version, so
+// _withReader can route an outdated file through one writer pass first.
+async function openSyncDb(dbPath, { migrate = true } = {}) {
   const SQL = await _getSQL();
   const data = _readDbFile(dbPath);
-  const db = data ? new SQL.Database(data) : new SQL.Database();
-  _ensureSchema(db);
+  const fresh = !data || !data.length;
+  const db = fresh ? new SQL.Database() : new SQL.Database(data);
+  // page_size and auto_vacuum only take effect before the first table is
+  // created. 8 KiB pages fit the wide emails rows without spilling onto
+  // overflow pages; incremental auto_vacuum lets compact() hand freed pages
+  // back without a full VACUUM. Older files keep their modes until VACUUMed.
+  if (fresh && migrate) db.exec("PRAGMA page_size = 8192; PRAGMA auto_vacuum = INCREMENTAL;");
+  db.exec(_CONNECTION_PRAGMAS);
+  let version = Number(_execScalar(db, "PRAGMA user_version") || 0);
+  if (migrate && version < _SCHEMA_VERSION) {
+    _ensureSchema(db);
+    _ensureFts(db);
+    db.exec(`PRAGMA user_version = ${_SCHEMA_VERSION}`);
+    version = _SCHEMA_VERSION;
+  }
+  const fts = _ftsMode(db);
   return {
     db,
+    fts,
+    version,
     flush() {
       const bytes = db.export();
       _writeDbFile(dbPath, bytes);
     },
     close() {
+      _stmtCaches.delete(db);
       db.close();
     },
   };
 }
 
-async function listEmailsFromCache({ dbPath, accountId, folder, unreadOnly, limit, offset, dateFrom, dateTo }) {
-  if (!dbPath || !fs.existsSync(dbPath)) return null;
+// sql.js keeps the whole database image in memory and flush() rewrites the
+// file, so two overlapping writers would silently drop each other's changes.
+// Writers are therefore funnelled through one queue per file; readers never
+// wait on it.
+const _writeQueues = new Map();
 
-  const h = await openSyncDb(dbPath);
+function _enqueueWrite(dbPath, task) {
+  const prev = _writeQueues.get(dbPath) || Promise.resolve();
+  const run = prev.then(task, task);
+  const tail = run.then(
+    () => {},
+    () => {}
+  );
+  _writeQueues.set(dbPath, tail);
+  tail.then(() => {
+    if (_writeQueues.get(dbPath) === tail) _writeQueues.delete(dbPath);
+  });
+  return run;
+}
+
+// One reader and one writer handle per file are kept open for the life of
+// the process instead of re-reading and re-parsing the file on every call.
+// A handle is reused only while the file on disk still matches what it
+// loaded or last flushed; another process may write the cache too.
+const _handles = new Map();
+
+function _fileStamp(dbPath) {
   try {
-    const f = String(folder || "all");
-    const resolvedFolder = f && f !== "all" ? f : "all";
+    const st = fs.statSync(dbPath);
+    return `${st.ino}:${st.size}:${st.mtimeMs}`;
+  } catch {
+    return "";
+  }
+}
+
+function _dropHandle(key) {
+  const entry = _handles.get(key);
+  if (!entry) return;
+  _handles.delete(key);
+  entry.ready.then(
+    (h) => h.close(),
+    () => {}
+  );
+}
+
+function _acquire(dbPath, role) {
+  const key = `${role}\u0000${dbPath}`;
+  const stamp = _fileStamp(dbPath);
+  const cached = _handles.get(key);
+  if (cached && cached.stamp === stamp) return { key, ready: cached.ready };
+  _dropHandle(key);
+
+  const entry = { stamp, ready: null };
+  entry.ready = openSyncDb(dbPath, { migrate: role === "writer" }).then((h) => {
+    if (role === "reader") h.db.run("PRAGMA query_only = 1");
+    return h;
+  });
+  entry.ready.catch(() => {
+    if (_handles.get(key) === entry) _handles.delete(key);
+  });
+  _handles.set(key, entry);
+  return { key, ready: entry.ready };
+}
+
+async function _withReader(dbPath, fn) {
+  let h = await _acquire(dbPath, "reader").ready;
+  if (h.version < _SCHEMA_VERSION) {
+    // Migrate once through the writer (a single flush), then reopen: the
+    // flush changes the file stamp.
+    await _withWriter(dbPath, () => null);
+    h = await _acquire(dbPath, "reader").ready;
+  }
+  return fn(h);
+}
+
+async function _withWriter(dbPath, fn) {
+  return _enqueueWrite(dbPath, async () => {
+    const { key, ready } = _acquire(dbPath, "writer");
+    const h = await ready;
+    h.db.run("BEGIN IMMEDIATE");
+    let result;
+    try {
+      result = await fn(h);
+      h.db.run("COMMIT");
+    } catch (e) {
+      // SQLite already rolls back on some errors (SQLITE_FULL, IOERR, ...);
+      // a second ROLLBACK would throw and mask the original error.
+      try {
+        h.db.run("ROLLBACK");
+      } catch {
+        // no transaction active
+      }
+      _syncedRows.delete(h.db);
+      throw e;
+    }
+    try {
+      h.flush();
+    } catch (e) {
+      // The in-memory image is now ahead of the file; never reuse it.
+      _dropHandle(key);
+      throw e;
+    }
+    const entry = _handles.get(key);
+    if (entry) entry.stamp = _fileStamp(dbPath);
+    return result;
+  });
+}
+
+async function _withDb(dbPath, { write = false } = {}, fn) {
+  return write ? _withWriter(dbPath, fn) : _withReader(dbPath, fn);
+}
+
+// The cache queries only vary by which optional filters are active, so each
+// query shape is built once and memoized. Repeat calls skip the string
+// building and hand _prepare the same SQL text, hitting its statement cache.
+const _sqlMemo = new Map();
+
+function _memoSql(key, build) {
+  let sql = _sqlMemo.get(key);
+  if (sql === undefined) {
+    sql = build();
+    _sqlMemo.set(key, sql);
+  }
+  return sql;
+}
+
+// WHERE conditions shared by the cache list and search queries. Column
+// references use the given emails/folders aliases (e/f by default). `shape`
+// identifies the active filters for _memoSql keys.
+function _cacheFilters({ accountId, folder, unreadOnly, dateFrom, dateTo }, { e = "e", f = "f" } = {}) {
+  const fname = String(folder || "all");
+  const resolvedFolder = fname && fname !== "all" ? fname : "all";
+
+  const params = [];
+  if (accountId) params.push(String(accountId));
+  if (resolvedFolder !== "all") params.push(resolvedFolder, resolvedFolder);
+  if (dateFrom) params.push(_epochSeconds(dateFrom));
+  if (dateTo) params.push(_epochSeconds(dateTo));
+
+  const shape = [accountId, resolvedFolder !== "all", unreadOnly, dateFrom, dateTo].map((v) => (v ? 1 : 0)).join("");
+  const where = _memoSql(`where:${e}:${f}:${shape}`, () => {
+    let sql = `${e}.is_deleted = 0`;
+    if (shape[0] === "1") sql += ` AND ${e}.account_id = ?`;
+    if (shape[1] === "1") sql += ` AND (${f}.name = ? COLLATE NOCASE OR (${e}.folder_id IS NULL AND ? = 'INBOX'))`;
+    if (shape[2] === "1") sql += ` AND ${e}.is_read = 0`;
+    if (shape[3] === "1") sql += ` AND ${e}.date_sent_epoch >= ?`;
+    if (shape[4] === "1") sql += ` AND ${e}.date_sent_epoch <= ?`;
+    return sql;
+  });
+  return { shape, where, params };
+}
+
+// The same message can be cached in several folders; keep only the newest
+// copy per (message_id, account_id) among rows passing the same filters.
+// MAX(id) per group is an index walk over idx_emails_dedup, unlike a window
+// function or DISTINCT, which sort the whole candidate set.
+function _dedupFilter(opts) {
+  const inner = _cacheFilters(opts, { e: "d", f: "df" });
+  return {
+    where: _memoSql(
+      `dedup:${inner.shape}`,
+      () => `(COALESCE(e.message_id, '') = '' OR e.id IN (
+      SELECT MAX(d.id) FROM emails d
+      LEFT JOIN folders df ON d.folder_id = df.id
+      WHERE ${inner.where} AND d.message_id <> ''
+      GROUP BY d.message_id, d.account_id
+    ))`
+    ),
+    params: inner.params,
+  };
+}
+
+function _listEmails(h, { accountId, folder, unreadOnly, limit, offset, dateFrom, dateTo }) {
+  const filters = _cacheFilters({ accountId, folder, unreadOnly, dateFrom, dateTo });
+  const dedup = _dedupFilter({ accountId, folder, unreadOnly, dateFrom, dateTo });
 
-    let query = `
-      SELECT DISTINCT
-        e.uid as id,
+  // Only the columns the list contract needs; the counts below project
+  // nothing but is_read and skip the accounts join.
+  const from = _memoSql(
+    `list-from:${filters.shape}`,
+    () => `
+    FROM emails e
+    LEFT JOIN folders f ON e.folder_id = f.id
+    WHERE ${filters.where} AND ${dedup.where}
+  `
+  );
+  const params = [...filters.params, ...dedup.params];
+
+  const rows = _iterRows(
+    h.db,
+    _memoSql(
+      `list:${filters.shape}`,
+      () => `
+      SELECT
         e.uid as uid,
         e.message_id as message_id,
         e.subject,
@@ -211,184 +651,433 @@ async function listEmailsFromCache({ dbPath, accountId, folder, unreadOnly, limi
         e.is_read as is_read,
         e.has_attachments as has_attachments,
         e.account_id as account_id,
-        COALESCE(a.email, e.account_id) as account,
+        (SELECT email FROM accounts WHERE id = e.account_id) as account,
         CASE WHEN e.folder_id IS NULL THEN 'INBOX' ELSE f.name END as folder
+      ${from}
+      ORDER BY e.date_sent_epoch DESC LIMIT ? OFFSET ?
+    `
+    ),
+    [...params, Number(limit), Number(offset)]
+  );
+  const emails = Array.from(rows, ([uid, messageId, subject, sender, date, isRead, hasAttachments, rowAccountId, account, rowFolder]) => ({
+    id: String(uid),
+    uid: String(uid),
+    message_id: messageId || "",
+    subject: subject || "No Subject",
+    from: sender || "",
+    date: date || "",
+    unread: !isRead,
+    has_attachments: Boolean(hasAttachments),
+    account: account || rowAccountId || "",
+    account_id: rowAccountId || "",
+    folder: rowFolder || "INBOX",
+    source: "cache_sync_db",
+  }));
+
+  // totals (same filters, no limit)
+  const countSql = _memoSql(`list-count:${filters.shape}`, () => `SELECT COUNT(*), TOTAL(e.is_read = 0) ${from}`);
+  const [[total, unread] = []] = _execRows(h.db, countSql, params);
+  const total_in_folder = Number(total || emails.length);
+  const unread_count = Number(unread || emails.filter((e) => e.unread).length);
+
+  return {
+    success: true,
+    emails,
+    total_in_folder,
+    unread_count,
+    offset: Number(offset),
+    limit: Number(limit),
+    from_cache: true,
+  };
+}
+
+function _searchEmails(h, { query, accountId, folder, unreadOnly, limit, offset, dateFrom, dateTo }) {
+  const filters = _cacheFilters({ accountId, folder, unreadOnly, dateFrom, dateTo });
+  const dedup = _dedupFilter({ accountId, folder, unreadOnly, dateFrom, dateTo });
+  const match = h.fts ? _ftsQuery(h.fts, query) : "";
+
+  const params = [];
+  if (match) {
+    params.push(match);
+  } else {
+    const like = `%${String(query || "")}%`;
+    params.push(like, like, like);
+  }
+  params.push(...filters.params, ...dedup.params);
+
+  const mode = match ? "fts" : "like";
+  const from = _memoSql(`search-from:${mode}:${filters.shape}`, () =>
+    match
+      ? `
+      FROM emails_fts
+      JOIN emails e ON e.id = emails_fts.rowid
+      LEFT JOIN folders f ON e.folder_id = f.id
+      WHERE emails_fts MATCH ? AND ${filters.where} AND ${dedup.where}
+    `
+      : `
       FROM emails e
-      LEFT JOIN accounts a ON e.account_id = a.id
       LEFT JOIN folders f ON e.folder_id = f.id
-      WHERE e.is_deleted = 0
-    `;
+      WHERE (e.subject LIKE ? OR e.sender LIKE ? OR e.sender_email LIKE ?) AND ${filters.where} AND ${dedup.where}
+    `
+  );
 
-    const params = [];
-    if (accountId) {
-      query += " AND e.account_id = ?";
-      params.push(String(accountId));
-    }
-    if (resolvedFolder !== "all") {
-      query += " AND (f.name = ? COLLATE NOCASE OR (e.folder_id IS NULL AND ? = 'INBOX'))";
-      params.push(resolvedFolder);
-      params.push(resolvedFolder);
-    }
-    if (unreadOnly) {
-      query += " AND e.is_read = 0";
-    }
-    if (dateFrom) {
-      query += " AND e.date_sent >= ?";
-      params.push(String(dateFrom));
-    }
-    if (dateTo) {
-      query += " AND e.date_sent <= ?";
-      params.push(String(dateTo));
-    }
+  const countSql = _memoSql(`search-count:${mode}:${filters.shape}`, () => `SELECT COUNT(*) ${from}`);
+  const total_found = Number(_execScalar(h.db, countSql, params) || 0);
+  const rows = _iterRows(
+    h.db,
+    _memoSql(
+      `search:${mode}:${filters.shape}`,
+      () => `
+      SELECT
+        e.uid as uid,
+        e.message_id as message_id,
+        e.subject,
+        e.sender_email as "from",
+        e.date_sent as date,
+        e.is_read as is_read,
+        e.is_flagged as is_flagged,
+        e.has_attachments as has_attachments,
+        e.account_id as account_id,
+        (SELECT email FROM accounts WHERE id = e.account_id) as account,
+        CASE WHEN e.folder_id IS NULL THEN 'INBOX' ELSE f.name END as folder
+      ${from}
+      ORDER BY e.date_sent_epoch DESC LIMIT ? OFFSET ?
+    `
+    ),
+    [...params, Number(limit), Number(offset)]
+  );
 
-    // totals (same filters, no limit)
-    const totalSql = `SELECT COUNT(*) FROM (${query})`;
-    const unreadSql = `SELECT COUNT(*) FROM (${query} AND is_read = 0)`;
-
-    query += " ORDER BY e.date_sent DESC LIMIT ? OFFSET ?";
-    params.push(Number(limit));
-    params.push(Number(offset));
-
-    const rows = _execRows(h.db, query, params);
-    const emails = rows.map((row) => ({
-      id: String(row.id),
-      uid: String(row.uid),
-      message_id: row.message_id || "",
-      subject: row.subject || "No Subject",
-      from: row.from || "",
-      date: row.date || "",
-      unread: !row.is_read,
-      has_attachments: Boolean(row.has_attachments),
-      account: row.account || "",
-      account_id: row.account_id || "",
-      folder: row.folder || "INBOX",
-      source: "cache_sync_db",
-    }));
-
-    const total_in_folder = Number(_execScalar(h.db, totalSql, params.slice(0, -2)) || emails.length);
-    const unread_count = Number(_execScalar(h.db, unreadSql, params.slice(0, -2)) || emails.filter((e) => e.unread).length);
-
-    return {
-      success: true,
-      emails,
-      total_in_folder,
-      unread_count,
-      offset: Number(offset),
-      limit: Number(limit),
-      from_cache: true,
-    };
+  const emails = Array.from(rows, ([uid, messageId, subject, sender, date, isRead, isFlagged, hasAttachments, rowAccountId, account, rowFolder]) => ({
+    id: String(uid),
+    uid: String(uid),
+    subject: subject || "",
+    from: sender || "",
+    to: "",
+    date: date || "",
+    unread: !isRead,
+    flagged: Boolean(isFlagged),
+    is_flagged: Boolean(isFlagged),
+    has_attachments: Boolean(hasAttachments),
+    message_id: messageId || "",
+    account: account || rowAccountId || "",
+    account_id: rowAccountId || "",
+    folder: rowFolder || "INBOX",
+    preview: "",
+  }));
+
+  return { success: true, emails, total_found, from_cache: true };
+}
+
+async function listEmailsFromCache({ dbPath, accountId, folder, unreadOnly, limit, offset, dateFrom, dateTo }) {
+  if (!dbPath || !fs.existsSync(dbPath)) return null;
+
+  try {
+    return await _withDb(dbPath, { write: false }, (h) => _listEmails(h, { accountId, folder, unreadOnly, limit, offset, dateFrom, dateTo }));
   } catch {
     return null;
-  } finally {
-    try {
-      h.close();
-    } catch {
-      // ignore
-    }
   }
 }
 
-async function upsertAccount({ dbPath, id, email, provider }) {
-  const h = await openSyncDb(dbPath);
+// null only when there is no cache file; read or migration errors come back
+// as { success: false } so the caller can report them.
+async function searchEmailsFromCache({ dbPath, query, accountId, folder, unreadOnly, limit, offset, dateFrom, dateTo }) {
+  if (!dbPath || !fs.existsSync(dbPath)) return null;
+
   try {
-    h.db.run(
-      "INSERT OR REPLACE INTO accounts (id, email, provider, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
-      [String(id), String(email), String(provider)]
+    return await _withDb(dbPath, { write: false }, (h) =>
+      _searchEmails(h, { query, accountId, folder, unreadOnly, limit, offset, dateFrom, dateTo })
     );
-    h.flush();
+  } catch (e) {
+    return { success: false, error: e && e.message ? e.message : "db error" };
+  }
+}
+
+// Update in place: REPLACE deletes and re-inserts the row, resetting
+// last_sync/total_emails/created_at that the Python sync maintains.
+const _UPSERT_ACCOUNT_SQL = `
+  INSERT INTO accounts (id, email, provider, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+  ON CONFLICT(id) DO UPDATE SET
+    email = excluded.email,
+    provider = excluded.provider,
+    updated_at = excluded.updated_at
+`;
+
+function _upsertAccountRow(h, { id, email, provider }) {
+  _prepare(h.db, _UPSERT_ACCOUNT_SQL).run([String(id), String(email), String(provider)]);
+}
+
+async function upsertAccount({ dbPath, id, email, provider }) {
+  try {
+    await _withDb(dbPath, { write: true }, (h) => _upsertAccountRow(h, { id, email, provider }));
     return { success: true };
   } catch (e) {
     return { success: false, error: e && e.message ? e.message : "db error" };
-  } finally {
-    h.close();
   }
 }
 
+// Keep the Python semantics: do NOT use REPLACE because it breaks folder_id.
+// RETURNING (SQLite >= 3.35) hands back the id without a second lookup.
+const _UPSERT_FOLDER_SQL = `
+  INSERT INTO folders (account_id, name, display_name, message_count, unread_count, last_sync)
+  VALUES (?, ?, ?, ?, ?, ?)
+  ON CONFLICT(account_id, name) DO UPDATE SET
+    display_name = COALESCE(excluded.display_name, folders.display_name),
+    message_count = excluded.message_count,
+    unread_count = excluded.unread_count,
+    last_sync = excluded.last_sync
+  RETURNING id
+`;
+
+function _upsertFolderRow(h, { accountId, name, displayName, messageCount, unreadCount, lastSync }) {
+  return Number(
+    _execScalar(h.db, _UPSERT_FOLDER_SQL, [
+      String(accountId),
+      String(name),
+      displayName ? String(displayName) : null,
+      Number(messageCount || 0),
+      Number(unreadCount || 0),
+      lastSync,
+    ])
+  );
+}
+
 async function upsertFolder({ dbPath, accountId, name, displayName, messageCount, unreadCount, lastSyncIso }) {
-  const h = await openSyncDb(dbPath);
+  const lastSync = String(lastSyncIso || new Date().toISOString());
   try {
-    // Keep the Python semantics: do NOT use REPLACE because it breaks folder_id.
-    h.db.run(
-      `
-        INSERT INTO folders (account_id, name, display_name, message_count, unread_count, last_sync)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(account_id, name) DO UPDATE SET
-          display_name = excluded.display_name,
-          message_count = excluded.message_count,
-          unread_count = excluded.unread_count,
-          last_sync = excluded.last_sync
-      `,
-      [
-        String(accountId),
-        String(name),
-        String(displayName || name),
-        Number(messageCount || 0),
-        Number(unreadCount || 0),
-        String(lastSyncIso || new Date().toISOString()),
-      ]
-    );
-    const folderId = _execScalar(
-      h.db,
-      "SELECT id FROM folders WHERE account_id = ? AND name = ?",
-      [String(accountId), String(name)]
+    const folderId = await _withDb(dbPath, { write: true }, (h) =>
+      _upsertFolderRow(h, { accountId, name, displayName, messageCount, unreadCount, lastSync })
     );
-    h.flush();
-    return { success: true, folderId: Number(folderId) };
+    return { success: true, folderId };
   } catch (e) {
     return { success: false, error: e && e.message ? e.message : "db error" };
-  } finally {
-    h.close();
   }
 }
 
-async function upsertEmails({ dbPath, accountId, folderId, emails }) {
-  const h = await openSyncDb(dbPath);
-  try {
-    const stmt = h.db.prepare(
-      `
-        INSERT OR REPLACE INTO emails (
-          account_id, folder_id, uid, message_id, subject, sender, sender_email, recipients,
-          date_sent, is_read, is_flagged, is_deleted, has_attachments, size_bytes, sync_status, updated_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'synced', CURRENT_TIMESTAMP)
-      `
-    );
-    try {
-      for (const e of emails || []) {
-        const uid = String(e.uid || e.id || "").trim();
-        if (!uid) continue;
-        const isRead = e.unread ? 0 : 1;
-        stmt.run([
-          String(accountId),
-          Number(folderId),
-          uid,
-          String(e.message_id || ""),
-          String(e.subject || ""),
-          String(e.from || ""),
-          String(e.from || ""),
-          JSON.stringify({ to: e.to || "", cc: e.cc || "" }),
-          String(e.date || ""),
-          isRead,
-          0,
-          0,
-          e.has_attachments ? 1 : 0,
-          Number(e.size_bytes || e.size || 0),
-        ]);
-      }
-    } finally {
-      stmt.free();
+// Upsert in place rather than REPLACE: REPLACE deletes the old row without
+// firing delete triggers (leaving emails_fts stale) and renumbers e.id.
+// Rows whose synced state is unchanged are left alone (no write, no FTS churn,
+// no updated count) and return no id. Recipients go both to the JSON column
+// (Python parity) and, per address, to email_recipients.
+const _UPSERT_EMAIL_SQL = `
+  INSERT INTO emails (
+    account_id, folder_id, uid, message_id, subject, sender, sender_email, recipients,
+    date_sent, date_sent_epoch, is_read, is_flagged, is_deleted, has_attachments, size_bytes, content_hash, sync_status, updated_at
+  ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'synced', CURRENT_TIMESTAMP)
+  ON CONFLICT(account_id, folder_id, uid) DO UPDATE SET
+    message_id = excluded.message_id,
+    subject = excluded.subject,
+    sender = excluded.sender,
+    sender_email = excluded.sender_email,
+    recipients = excluded.recipients,
+    date_sent = excluded.date_sent,
+    date_sent_epoch = excluded.date_sent_epoch,
+    is_read = excluded.is_read,
+    is_flagged = excluded.is_flagged,
+    is_deleted = excluded.is_deleted,
+    has_attachments = excluded.has_attachments,
+    size_bytes = excluded.size_bytes,
+    content_hash = excluded.content_hash,
+    sync_status = excluded.sync_status,
+    updated_at = excluded.updated_at
+  WHERE emails.content_hash IS NOT excluded.content_hash
+    OR emails.is_read IS NOT excluded.is_read
+    OR emails.is_flagged IS NOT excluded.is_flagged
+    OR emails.is_deleted IS NOT excluded.is_deleted
+    OR emails.has_attachments IS NOT excluded.has_attachments
+    OR emails.size_bytes IS NOT excluded.size_bytes
+  RETURNING id
+`;
+
+const _DELETE_RECIPIENTS_SQL = "DELETE FROM email_recipients WHERE email_id = ?";
+const _INSERT_RECIPIENT_SQL = "INSERT INTO email_recipients (email_id, kind, idx, address, name) VALUES (?, ?, ?, ?, ?)";
+const _OPEN_SYNC_HISTORY_SQL = "INSERT INTO sync_history (account_id, folder_name, sync_type, status) VALUES (?, ?, ?, 'running') RETURNING id";
+const _CLOSE_SYNC_HISTORY_SQL = `
+  UPDATE sync_history SET status = 'success', end_time = CURRENT_TIMESTAMP
+  WHERE id = ? RETURNING emails_added, emails_updated
+`;
+
+// "Name <a@x>, b@y" -> [["a@x", "Name"], ["b@y", null]]. Commas inside a
+// quoted display name don't split.
+function _parseAddressList(value) {
+  const out = [];
+  for (const part of String(value || "").split(/,(?=(?:[^"]*"[^"]*")*[^"]*$)/)) {
+    const text = part.trim();
+    if (!text) continue;
+    const m = text.match(/^(.*)<([^>]+)>\s*$/);
+    if (m) {
+      const name = m[1].trim().replace(/^"|"$/g, "");
+      out.push([m[2].trim().toLowerCase(), name || null]);
+    } else {
+      out.push([text.toLowerCase(), null]);
     }
-    h.flush();
-    return { success: true };
+  }
+  return out;
+}
+
+// Synced state last written (or confirmed unchanged) per (folder_id, uid) on
+// this handle, so repeat syncs in one process (sync daemon) skip the upsert
+// for untouched rows outright. Tied to the db object: a reopened handle
+// starts empty, and a rollback clears it since its entries may never have
+// landed.
+const _SYNCED_ROWS_MAX = 50000;
+const _syncedRows = new WeakMap();
+
+function _syncedRowMemo(db) {
+  let memo = _syncedRows.get(db);
+  if (!memo) {
+    memo = new Map();
+    _syncedRows.set(db, memo);
+  }
+  return memo;
+}
+
+function _upsertEmailRows(h, { accountId, folderId, folderName, syncType = "incremental", emails }) {
+  const synced = _syncedRowMemo(h.db);
+  const historyId = _execScalar(h.db, _OPEN_SYNC_HISTORY_SQL, [String(accountId), folderName ? String(folderName) : null, String(syncType)]);
+  const upsertEmail = _prepare(h.db, _UPSERT_EMAIL_SQL);
+  const deleteRecipients = _prepare(h.db, _DELETE_RECIPIENTS_SQL);
+  const insertRecipient = _prepare(h.db, _INSERT_RECIPIENT_SQL);
+  for (const e of emails || []) {
+    const uid = String(e.uid || e.id || "").trim();
+    if (!uid) continue;
+    const isRead = e.unread ? 0 : 1;
+    const messageId = String(e.message_id || "");
+    const subject = String(e.subject || "");
+    const sender = String(e.from || "");
+    const dateSent = String(e.date || "");
+    const hasAttachments = e.has_attachments ? 1 : 0;
+    const sizeBytes = Number(e.size_bytes || e.size || 0);
+    const contentHash = _contentHash(messageId, subject, sender, dateSent);
+    const rowKey = `${folderId}\u0000${uid}`;
+    const state = `${contentHash.toString("base64")}:${isRead}:${hasAttachments}:${sizeBytes}`;
+    if (synced.get(rowKey) === state) continue;
+
+    const emailId = _stmtScalar(upsertEmail, [
+      String(accountId),
+      Number(folderId),
+      uid,
+      messageId,
+      subject,
+      sender,
+      sender,
+      JSON.stringify({ to: e.to || "", cc: e.cc || "" }),
+      dateSent,
+      _epochSeconds(dateSent),
+      isRead,
+      0,
+      0,
+      hasAttachments,
+      sizeBytes,
+      contentHash,
+    ]);
+    synced.delete(rowKey);
+    synced.set(rowKey, state);
+    if (synced.size > _SYNCED_ROWS_MAX) synced.delete(synced.keys().next().value);
+    if (emailId === null) continue;
+
+    deleteRecipients.run([emailId]);
+    for (const kind of ["to", "cc"]) {
+      _parseAddressList(e[kind]).forEach(([address, name], idx) => insertRecipient.run([emailId, kind, idx, address, name]));
+    }
+  }
+
+  const [[added, updated]] = _execRows(h.db, _CLOSE_SYNC_HISTORY_SQL, [historyId]);
+  return { added: Number(added), updated: Number(updated) };
+}
+
+async function upsertEmails({ dbPath, accountId, folderId, folderName, syncType = "incremental", emails }) {
+  try {
+    const counts = await _withDb(dbPath, { write: true }, (h) => _upsertEmailRows(h, { accountId, folderId, folderName, syncType, emails }));
+    return { success: true, ...counts };
+  } catch (e) {
+    return { success: false, error: e && e.message ? e.message : "db error" };
+  }
+}
+
+// Planner statistics, refreshed inside the sync transaction so they land in
+// the same flush. The first sync into a file has no sqlite_stat1 yet and gets
+// a full (sampled) ANALYZE; later ones let PRAGMA optimize re-analyze only
+// tables whose size has drifted. analysis_limit caps either at a few hundred
+// rows per index.
+function _refreshStats(h) {
+  const analyzed = _execScalar(h.db, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'");
+  h.db.exec(`PRAGMA analysis_limit = 400; ${analyzed ? "PRAGMA optimize = 0x10002" : "ANALYZE"};`);
+}
+
+// Hands up to `pages` free pages back (no-op on files created without
+// incremental auto_vacuum); returns how many were released.
+function _incrementalVacuum(h, pages) {
+  const before = Number(_execScalar(h.db, "PRAGMA freelist_count") || 0);
+  h.db.exec(`PRAGMA incremental_vacuum(${Math.max(0, Math.floor(Number(pages) || 0))})`);
+  return before - Number(_execScalar(h.db, "PRAGMA freelist_count") || 0);
+}
+
+// Thrown out of the syncFolders writer when every step rolled back: the
+// transaction ends with ROLLBACK and the unchanged image is not flushed.
+const _NOTHING_WRITTEN = new Error("no sync step succeeded");
+
+// Sync steps (account row, folder row and fetched emails per account folder)
+// share one writer transaction, so the cache file is read, committed and
+// flushed once per sync run rather than once per upsert. Each step runs in
+// its own SAVEPOINT: a failing step is rolled back alone and reported, the
+// others still commit. vacuumPages > 0 also releases free pages in the same
+// transaction, so compacting costs no extra flush. With no steps, or none
+// that succeeded, there is nothing to analyze or flush.
+async function syncFolders({ dbPath, steps, vacuumPages = 0 }) {
+  if (!steps || !steps.length) return { success: true, results: [], freed_pages: 0 };
+  let out = [];
+  try {
+    const freed = await _withDb(dbPath, { write: true }, (h) => {
+      out = steps.map(({ account, folder, syncType = "incremental", emails }) => {
+        const lastSync = String(folder.lastSyncIso || new Date().toISOString());
+        h.db.run("SAVEPOINT sync_step");
+        try {
+          _upsertAccountRow(h, account);
+          const folderId = _upsertFolderRow(h, { ...folder, accountId: account.id, lastSync });
+          const counts = _upsertEmailRows(h, { accountId: account.id, folderId, folderName: folder.name, syncType, emails });
+          h.db.run("RELEASE sync_step");
+          return { success: true, folderId, ...counts };
+        } catch (e) {
+          h.db.run("ROLLBACK TO sync_step");
+          h.db.run("RELEASE sync_step");
+          _syncedRows.delete(h.db);
+          return { success: false, error: e && e.message ? e.message : "db error" };
+        }
+      });
+      if (!out.some((r) => r.success)) throw _NOTHING_WRITTEN;
+      _refreshStats(h);
+      return vacuumPages > 0 ? _incrementalVacuum(h, vacuumPages) : 0;
+    });
+    return { success: true, results: out, freed_pages: freed };
+  } catch (e) {
+    if (e === _NOTHING_WRITTEN) return { success: true, results: out, freed_pages: 0 };
+    return { success: false, error: e && e.message ? e.message : "db error" };
+  }
+}
+
+async function syncFolder({ dbPath, account, folder, syncType = "incremental", emails }) {
+  const res = await syncFolders({ dbPath, steps: [{ account, folder, syncType, emails }] });
+  return res.success ? res.results[0] : res;
+}
+
+// Standalone compaction; syncs pass vacuumPages to syncFolders instead.
+async function compact({ dbPath, pages = 1000 }) {
+  if (!dbPath || !fs.existsSync(dbPath)) return { success: true, freed_pages: 0 };
+  try {
+    const freed = await _withDb(dbPath, { write: true }, (h) => _incrementalVacuum(h, pages));
+    return { success: true, freed_pages: freed };
   } catch (e) {
     return { success: false, error: e && e.message ? e.message : "db error" };
-  } finally {
-    h.close();
   }
 }
 
 module.exports = {
+  compact,
   listEmailsFromCache,
+  searchEmailsFromCache,
   upsertAccount,
   upsertFolder,
   upsertEmails,
+  syncFolder,
+  syncFolders,
 };
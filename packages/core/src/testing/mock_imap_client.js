@@ -41,6 +41,15 @@ class MockImapClient {
     this._mailbox = "INBOX";
   }
 
+  // Connection lifecycle used by the client pool; the mock has no socket.
+  on() {
+    return this;
+  }
+
+  async logout() {
+    this.mailbox = false;
+  }
+
   async mailboxOpen(name) {
     this._mailbox = name || "INBOX";
     const mb = getMailbox(this._account.id, this._mailbox);
@@ -51,6 +60,21 @@ class MockImapClient {
     return this.mailbox;
   }
 
+  async noop() {
+    // A real server answers NOOP with untagged EXISTS/EXPUNGE; ImapFlow
+    // updates exists in place and leaves the SELECT-time unseen alone.
+    if (!this.mailbox) return;
+    const messages = (getMailbox(this._account.id, this.mailbox.path) || {}).messages || [];
+    this.mailbox.exists = messages.length;
+  }
+
+  async status(name) {
+    const mb = getMailbox(this._account.id, name || "INBOX");
+    if (!mb) throw new Error(`Mailbox not found: ${name}`);
+    const messages = mb.messages || [];
+    return { path: name, messages: messages.length, unseen: messages.filter((m) => !m.flags.has("\\Seen")).length };
+  }
+
   async getMailboxLock(name) {
     await this.mailboxOpen(name);
     return {
@@ -123,10 +147,18 @@ class MockImapClient {
     return list.map((m) => m.uid);
   }
 
-  async *fetch(uids, opts) {
+  async *fetch(uids, opts, options) {
     const mb = getMailbox(this._account.id, this._mailbox);
     if (!mb) throw new Error(`Mailbox not found: ${this._mailbox}`);
-    const set = new Set(Array.isArray(uids) ? uids : [uids]);
+    let set;
+    if (typeof uids === "string" && !(options && options.uid)) {
+      // "lo:hi" sequence range: sequence numbers follow ascending UID order.
+      const [lo, hi] = uids.split(":").map(Number);
+      const ordered = (mb.messages || []).map((m) => m.uid).sort((a, b) => a - b);
+      set = new Set(ordered.slice(lo - 1, hi || lo));
+    } else {
+      set = new Set(Array.isArray(uids) ? uids : [uids]);
+    }
     for (const m of mb.messages || []) {
       if (!set.has(m.uid)) continue;
       const msg = _cloneMessage(m);
@@ -156,24 +188,38 @@ class MockImapClient {
     return out;
   }
 
+  // Like ImapFlow, the message* commands report a rejected command by
+  // returning false. The mock rejects any set naming a UID the mailbox
+  // doesn't hold, leaving every message untouched.
+  _uidSet(mb, uids) {
+    const set = new Set(Array.isArray(uids) ? uids.map(Number) : [Number(uids)]);
+    const held = new Set((mb.messages || []).map((m) => m.uid));
+    for (const uid of set) if (!held.has(uid)) return null;
+    return set;
+  }
+
   async messageFlagsAdd(uids, flags) {
     const mb = getMailbox(this._account.id, this._mailbox);
     if (!mb) throw new Error(`Mailbox not found: ${this._mailbox}`);
-    const set = new Set(Array.isArray(uids) ? uids.map(Number) : [Number(uids)]);
+    const set = this._uidSet(mb, uids);
+    if (!set) return false;
     for (const m of mb.messages || []) {
       if (!set.has(m.uid)) continue;
       for (const f of flags) m.flags.add(f);
     }
+    return true;
   }
 
   async messageFlagsRemove(uids, flags) {
     const mb = getMailbox(this._account.id, this._mailbox);
     if (!mb) throw new Error(`Mailbox not found: ${this._mailbox}`);
-    const set = new Set(Array.isArray(uids) ? uids.map(Number) : [Number(uids)]);
+    const set = this._uidSet(mb, uids);
+    if (!set) return false;
     for (const m of mb.messages || []) {
       if (!set.has(m.uid)) continue;
       for (const f of flags) m.flags.delete(f);
     }
+    return true;
   }
 
   async messageMove(uids, target) {
@@ -181,7 +227,8 @@ class MockImapClient {
     const dst = getMailbox(this._account.id, target);
     if (!src) throw new Error(`Mailbox not found: ${this._mailbox}`);
     if (!dst) throw new Error(`Target mailbox not found: ${target}`);
-    const set = new Set(Array.isArray(uids) ? uids.map(Number) : [Number(uids)]);
+    const set = this._uidSet(src, uids);
+    if (!set) return false;
     const keep = [];
     for (const m of src.messages || []) {
       if (set.has(m.uid)) {
@@ -191,13 +238,16 @@ class MockImapClient {
       }
     }
     src.messages = keep;
+    return { path: this._mailbox, destination: target };
   }
 
   async messageDelete(uids) {
     const src = getMailbox(this._account.id, this._mailbox);
     if (!src) throw new Error(`Mailbox not found: ${this._mailbox}`);
-    const set = new Set(Array.isArray(uids) ? uids.map(Number) : [Number(uids)]);
+    const set = this._uidSet(src, uids);
+    if (!set) return false;
     src.messages = (src.messages || []).filter((m) => !set.has(m.uid));
+    return true;
   }
 
   async *list() {
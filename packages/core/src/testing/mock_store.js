@@ -42,6 +42,19 @@ function _ensureState() {
                     },
                   ],
                 },
+                {
+                  uid: 103,
+                  messageId: "<m103@example.com>",
+                  subject: "项目周报",
+                  from: "team@example.com",
+                  to: "mock@example.com",
+                  cc: "lead@example.com",
+                  date: "2026-01-31 09:00:00",
+                  flags: new Set(["\\Seen"]),
+                  body: "weekly report",
+                  html: "",
+                  attachments: [],
+                },
               ],
             },
             Trash: { messages: [] },